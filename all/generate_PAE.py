@@ -1,13 +1,24 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-This script uses the iptm_only.py output file to filter through the results, generating PAE plots that fit the user's input threshold
+This script uses the iptm_only.py output file to filter through the results, generating PAE plots that fit the user's input threshold.
+Every prediction folder listed at least -min_frequency times is plotted in-process by a pool of worker processes, which
+also scores its models with pDockQ for model_statistics.csv, reading the fasta file next to the prediction folder, so no
+script or fasta file is copied into the folders and the working directory is never changed. Folders whose plots are up
+to date with their inputs are neither scored nor plotted again.
+
+Usage: python generate_PAE.py -filtered_tsv <filtered_template_indep_info.tsv> [-min_frequency 3] [-workers N]
+Output: pdockq.csv, model_statistics.csv and the PAE, pLDDT and MSA plots in every selected prediction folder
 """
 
+import argparse
 import csv
 import os
-import subprocess
-import shutil
+import sys
+from multiprocessing import Pool
+# the scoring and plotting functions are kept in the individual folder
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'individual'))
+from pae import PAE_MAX_PIXELS, plot_prediction_folder_task
 
 def count_protein_frequencies(file_path, column_name):
     """
@@ -55,123 +66,66 @@ def find_base_folder_path(current_dir, target_file):
         else:
             current_dir = os.path.abspath(os.path.join(current_dir, os.pardir))
 
-def copy_fasta_file(base_folder, protein_name):
+def generate_pae(base_folder, proteins, workers=1, **plot_options):
     """
-    Copy the corresponding fasta file for a protein to its respective folder.
+    Score and plot the prediction folders of the given proteins in a pool of worker processes, see pae.plot_prediction_folder.
 
     Args:
-    base_folder (str): The base folder path containing the protein folders and the fasta file.
-    protein_name (str): Name of the protein folder and fasta file.
+    base_folder (str): Path to the folder containing the prediction folders and their fasta files.
+    proteins (list): Names of the prediction folders.
+    workers (int): Number of worker processes.
+    plot_options: Keyword arguments passed on to plot_prediction_folder.
 
     Returns:
-    bool: True if the fasta file is copied successfully, False otherwise.
+    dict: The prediction folders that were missing or failed with the reason.
     """
-    protein_folder_path = os.path.join(base_folder, protein_name)
-    fasta_file_src = os.path.join(base_folder, f"{protein_name}.fasta")
-    fasta_file_dest = os.path.join(protein_folder_path, f"{protein_name}.fasta")
-
-    if os.path.exists(fasta_file_src) and os.path.isdir(protein_folder_path):
-        shutil.copy(fasta_file_src, fasta_file_dest)
-        return True
-    else:
-        return False
-
-def copy_script_file(src_script_path, dest_folder):
-    """
-    Copy a script file to the destination folder.
-
-    Args:
-    src_script_path (str): Path to the source script file.
-    dest_folder (str): Path to the destination folder.
-
-    Returns:
-    bool: True if the script file is copied successfully, False otherwise.
-    """
-    if os.path.exists(src_script_path) and os.path.isdir(dest_folder):
-        shutil.copy(src_script_path, dest_folder)
-        return True
-    else:
-        return False
-
-def run_script(script_path):
-    """
-    Run a Python script and capture its output.
+    failed = {}
+    tasks = []
+    for protein in proteins:
+        protein_folder_path = os.path.join(base_folder, protein)
+        if os.path.isdir(protein_folder_path):
+            tasks.append((protein_folder_path, plot_options))
+        else:
+            print(f'Error: Folder for protein {protein} does not exist!')
+            failed[protein_folder_path] = 'missing folder'
 
-    Args:
-    script_path (str): Path to the Python script to be executed.
+    with Pool(processes=max(1, workers)) as pool:
+        for prediction_folder, status, error in pool.imap_unordered(plot_prediction_folder_task, tasks):
+            if error is None:
+                print(f'{prediction_folder}: {status}')
+            else:
+                print(f'{prediction_folder} failed, {error}')
+                failed[prediction_folder] = error
+    return failed
 
-    Returns:
-    bool: True if the script runs successfully, False otherwise.
-    """
-    try:
-        result = subprocess.run(['python', script_path], capture_output=True, text=True, check=True)
-        print(result.stdout)
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"Error running script {script_path}")
-        print(f"Return code: {e.returncode}")
-        print(f"Output: {e.output}")
-        print(f"Error: {e.stderr}")
-        return False
 
 def main():
-    file_path = '/Volumes/Untitled/salty_unprocessed/filtered_template_indep_info.tsv'
-    column_name = 'prediction_name'  # Name of the column containing protein names
-    protein_freq_dict = count_protein_frequencies(file_path, column_name)
-
-    # Set the bound for frequency
-    frequency_bound = 3
+    parser = argparse.ArgumentParser(description='Score with pDockQ and plot the prediction folders that pass the filter of iptm_only.py.')
+    parser.add_argument('-filtered_tsv', type=str, required=True, help='Path to the filtered_template_indep_info.tsv written from the iptm_only.py output', dest='filtered_tsv')
+    parser.add_argument('-column', type=str, default='prediction_name', help='Name of the column containing the prediction names, default prediction_name', dest='column')
+    parser.add_argument('-min_frequency', type=int, default=3, help='Smallest number of rows of a prediction for it to be plotted, default 3', dest='min_frequency')
+    parser.add_argument('-path_to_run', type=str, help='Path to the folder containing the prediction folders, default the folder of the tsv file', dest='path_to_run')
+    parser.add_argument('-workers', '--workers', type=int, default=1, help='Number of worker processes, default 1', dest='workers')
+    parser.add_argument('-pae_max_pixels', type=int, default=PAE_MAX_PIXELS, help=f'Largest number of pixels per side of a PAE panel, default {PAE_MAX_PIXELS}', dest='pae_max_pixels')
+    parser.add_argument('-force', action='store_true', help='Plot the prediction folders even if their plots are up to date with their inputs', dest='force')
+    args = parser.parse_args()
+
+    protein_freq_dict = count_protein_frequencies(args.filtered_tsv, args.column)
 
     # Directory containing the protein folders
     # Find the base folder path dynamically
-    current_dir = os.path.dirname(os.path.abspath(file_path))
-    base_folder_path = find_base_folder_path(current_dir, 'filtered_template_indep_info.tsv')
-    
+    base_folder_path = args.path_to_run
+    if base_folder_path is None:
+        current_dir = os.path.dirname(os.path.abspath(args.filtered_tsv))
+        base_folder_path = find_base_folder_path(current_dir, os.path.basename(args.filtered_tsv))
+
     if base_folder_path is None:
         print("Error: Could not find the base folder containing the target file.")
         return
 
-    for protein, freq in protein_freq_dict.items():
-        if freq >= frequency_bound:
-            protein_folder_path = os.path.join(base_folder_path, protein)
-            if os.path.exists(protein_folder_path):
-                os.chdir(protein_folder_path)  # Change directory to the protein folder
-                print(f'Changed directory to: {os.getcwd()}')
-                
-                # Copy the corresponding fasta file
-                if copy_fasta_file(base_folder_path, protein):
-                    print(f'Copied fasta file for {protein} to {protein_folder_path}')
-                else:
-                    print(f'Error copying fasta file for {protein}')
-
-                # Copy the pdockq.py script
-                pdockq_script_src = '/path/'
-                if copy_script_file(pdockq_script_src, protein_folder_path):
-                    print(f'Copied pdockq.py to {protein_folder_path}')
-                else:
-                    print(f'Error copying pdockq.py to {protein_folder_path}')
-
-                # Copy the plot_AF_all_unrelaxed.py script
-                plot_script_src = '/path/'
-                if copy_script_file(plot_script_src, protein_folder_path):
-                    print(f'Copied plot_AF_all_unrelaxed.py to {protein_folder_path}')
-                else:
-                    print(f'Error copying plot_AF_all_unrelaxed.py to {protein_folder_path}')
-
-                # Run first Python script
-                if not run_script('pdockq.py'):
-                    print(f"Error: Script pdockq.py failed for {protein}")
-                    continue
-
-                # Run second Python script
-                if not run_script('plot_AF_all_unrelaxed.py'):
-                    print(f"Error: Script plot_AF_all_unrelaxed.py failed for {protein}")
-                    continue
-
-                print(f'Scripts executed for {protein}')
-            else:
-                print(f'Error: Folder for protein {protein} does not exist!')
+    proteins = [protein for protein, freq in protein_freq_dict.items() if freq >= args.min_frequency]
+    failed = generate_pae(base_folder_path, proteins, workers=args.workers, pae_max_pixels=args.pae_max_pixels, force=args.force)
+    print(f'{len(proteins) - len(failed)} of {len(proteins)} prediction folders scored and plotted!')
 
 if __name__ == "__main__":
     main()
-
@@ -11,12 +11,16 @@ Part 1 was adapted from Chop Yan Lee's original code.
 The original code source by Chop Yan Lee: https://github.com/KatjaLuckLab/AlphaFold_manuscript/blob/main/scripts/calculate_template_independent_metrics.py
 """
 
-from pymol import cmd
 import numpy as np
-import matplotlib as plt
-import pandas as pd
-import json, os, pickle, argparse, sys, csv, shutil, subprocess
-from collections import defaultdict
+# matplotlib and pandas are imported by the functions using them, so that a metrics-only run does not wait for them
+import json, os, argparse, sys, csv, shutil, subprocess
+# the readers shared with the individual scripts are kept in the individual folder
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'individual'))
+from feature_cache import read_model_features
+from pdb_reader import read_pdb, read_chain_ids, chain_relabeling, rewrite_chain_ids
+# the fasta reader is shared with the preprocessing scripts
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'preprocessing'))
+from fasta_library import iter_fasta
 
 # Part 1: AlphaFold prediction processing
 
@@ -48,15 +52,9 @@ class Prediction_folder:
         
     def parse_prediction_fasta_file(self):
         fasta_path = f'{self.prediction_folder}.fasta'
-        with open(fasta_path, 'r') as f:
-            lines = [line.strip() for line in f.readlines() if line.strip() != '']
-        chain_id = 0
-        for line in lines:
-            if line[0] == '>':
-                chain = list(self.fasta_sequence_dict)[chain_id]
-                chain_id += 1
-                continue
-            self.fasta_sequence_dict[chain] += line
+        # chains are labeled in the order of the records, homomers repeat the same header
+        for chain_id, (header, sequence) in enumerate(iter_fasta(fasta_path)):
+            self.fasta_sequence_dict[chr(ord('A') + chain_id)] = sequence
 
     def instantiate_predicted_model(self):
         self.model_instances = {f'ranked_{i}': Predicted_model(f'ranked_{i}') for i in range(self.num_model)}
@@ -77,6 +75,7 @@ class Prediction_folder:
                 model_inst.get_model_independent_metrics()
     
     def write_out_calculated_metrics(self, project_name=None):
+        import pandas as pd
         metrics_out_path = os.path.join(self.path_to_prediction_folder, 'template_indep_info.tsv')
         metrics_columns_dtype = {'project_name': str, 'prediction_name': str, 'chain_A_length': int, 'chain_B_length': int, 'model_id': str, 'model_confidence': float}
     
@@ -119,69 +118,23 @@ class Predicted_model:
         self.chain_plddt = None
         self.pickle_data = None
         self.model_confidence = None
+        self.chain_map = {}
 
-    def check_chain_id(self):
+    def check_chain_id(self, rewrite=False):
+        # chains B and C are relabeled to A and B when the pdb file is read, or in the pdb file itself with rewrite
         model_path = os.path.join(self.path_to_model, f'{self.predicted_model}.pdb')
-        cmd.load(model_path)
-        chains = cmd.get_chains(f'{self.predicted_model}')
-        if 'C' in chains:
-            cmd.alter(f'{self.predicted_model} and chain B', 'chain="tempA"')
-            cmd.sort()
-            cmd.alter(f'{self.predicted_model} and chain C', 'chain="tempB"')
-            cmd.sort()
-            cmd.alter(f'{self.predicted_model} and chain tempA', 'chain="A"')
-            cmd.sort()
-            cmd.alter(f'{self.predicted_model} and chain tempB', 'chain="B"')
-            cmd.sort()
-            cmd.save(model_path, f'{self.predicted_model}')
-        cmd.reinitialize()
+        self.chain_map = chain_relabeling(read_chain_ids(model_path))
+        if self.chain_map and rewrite:
+            rewrite_chain_ids(model_path, self.chain_map)
+            self.chain_map = {}
 
     def read_pickle(self):
-        multimer_model_pickle = os.path.join(self.path_to_model, f'result_{self.multimer_model}.pkl')
-        with open(multimer_model_pickle, 'rb') as f:
-            self.pickle_data = pickle.load(f)
-
-    def parse_atm_record(self, line):
-        record = defaultdict()
-        record['name'] = line[0:6].strip()
-        record['atm_no'] = int(line[6:11])
-        record['atm_name'] = line[12:16].strip()
-        record['atm_alt'] = line[17]
-        record['res_name'] = line[17:20].strip()
-        record['chain'] = line[21]
-        record['res_no'] = int(line[22:26])
-        record['insert'] = line[26].strip()
-        record['resid'] = line[22:29]
-        record['x'] = float(line[30:38])
-        record['y'] = float(line[38:46])
-        record['z'] = float(line[46:54])
-        record['occ'] = float(line[54:60])
-        record['B'] = float(line[60:66])
-        return record
-    
+        # only ptm and iptm are parsed from the pickle, so they are read from the feature cache or with the scalar-only pickle reader
+        self.pickle_data = read_model_features(self.path_to_model, self.multimer_model, with_pae=False)
+
     def read_pdb(self):
-        chain_coords, chain_plddt = {}, {}
         model_path = os.path.join(self.path_to_model, f'{self.predicted_model}.pdb')
-
-        with open(model_path, 'r') as file:
-            for line in file:
-                if not line.startswith('ATOM'):
-                    continue
-                record = self.parse_atm_record(line)
-                if record['atm_name'] == 'CB' or (record['atm_name'] == 'CA' and record['res_name'] == 'GLY'):
-                    if record['chain'] in [*chain_coords.keys()]:
-                        chain_coords[record['chain']].append([record['x'], record['y'], record['z']])
-                        chain_plddt[record['chain']].append(record['B'])
-                    else:
-                        chain_coords[record['chain']] = [[record['x'], record['y'], record['z']]]
-                        chain_plddt[record['chain']] = [record['B']]
-        
-        for chain in chain_coords:
-            chain_coords[chain] = np.array(chain_coords[chain])
-            chain_plddt[chain] = np.array(chain_plddt[chain])
-
-        self.chain_coords = chain_coords
-        self.chain_plddt = chain_plddt
+        self.chain_coords, self.chain_plddt = read_pdb(model_path, chain_map=self.chain_map)
 
     def parse_ptm_iptm(self):
         self.ptm = float(self.pickle_data['ptm'])
@@ -202,6 +155,8 @@ class Predicted_model:
 # Part 2: PAE plot generation
 
 def generate_pae_plots(filtered_info_path):
+    import pandas as pd
+    import matplotlib.pyplot as plt
     print(f"Filtered metrics path: {filtered_info_path}")
     filtered_metrics = pd.read_csv(filtered_info_path, sep='\t')
     
@@ -232,10 +187,11 @@ def generate_pae_plots(filtered_info_path):
         plt.close()
         print(f'PAE plot saved at {plot_path}')
 
-if __name__ == "__main__":
+def main():
     parser = argparse.ArgumentParser(description="AlphaFold Prediction Processing and PAE Plot Generation")
     parser.add_argument("--prediction_folder", required=True, type=str, help="Path to the prediction folder")
     parser.add_argument("--project_name", required=False, type=str, help="Project name (optional)")
+    parser.add_argument("--skip_plots", action="store_true", help="Only calculate the metrics, without generating the PAE plots")
     args = parser.parse_args()
 
     prediction_folder = args.prediction_folder
@@ -245,5 +201,10 @@ if __name__ == "__main__":
     pred_folder.process_all_models()
     pred_folder.write_out_calculated_metrics()
 
+    if args.skip_plots:
+        return
     filtered_info_path = os.path.join(pred_folder.path_to_prediction_folder, 'filtered_template_indep_info.tsv')
     generate_pae_plots(filtered_info_path)
+
+if __name__ == "__main__":
+    main()
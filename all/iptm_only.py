@@ -14,11 +14,15 @@ The original code source by Chop Yan Lee: https://github.com/KatjaLuckLab/AlphaF
 # pDockQ code source: https://gitlab.com/ElofssonLab/FoldDock/-/blob/main/src/pdockq.py
 # iPAE code source: https://github.com/fteufel/alphafold-peptide-receptors/blob/main/qc_metrics.py
 
-from pymol import cmd
-import numpy as np
 import pandas as pd
-import json, os, pickle, argparse, sys
-from collections import defaultdict
+import json, os, argparse, sys
+# the readers shared with the individual scripts are kept in the individual folder
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'individual'))
+from feature_cache import read_model_features
+from pdb_reader import read_pdb, read_chain_ids, chain_relabeling, rewrite_chain_ids
+# the fasta reader is shared with the preprocessing scripts
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'preprocessing'))
+from fasta_library import iter_fasta
 
 class Prediction_folder:
     """Class that stores prediction folder information"""
@@ -59,15 +63,9 @@ class Prediction_folder:
         """Read the fasta file of the prediction to retrieve information on chain and sequence identity
         """
         fasta_path = f'{self.prediction_folder}.fasta'
-        with open(fasta_path, 'r') as f:
-            lines = [line.strip() for line in f.readlines() if line.strip() != '']
-        chain_id = 0
-        for line in lines:
-            if line[0] == '>':
-                chain = list(self.fasta_sequence_dict)[chain_id]
-                chain_id += 1
-                continue
-            self.fasta_sequence_dict[chain] += line
+        # chains are labeled in the order of the records, homomers repeat the same header
+        for chain_id, (header, sequence) in enumerate(iter_fasta(fasta_path)):
+            self.fasta_sequence_dict[chr(ord('A') + chain_id)] = sequence
 
     def instantiate_predicted_model(self):
         """Initialize the amount of Predicted_model instance according to the number of model specified and save it in the dict self.model_instances
@@ -162,62 +160,32 @@ class Predicted_model:
         self.chain_plddt = None
         self.pickle_data = None
         self.model_confidence = None
+        self.chain_map = {}
 
-    def check_chain_id(self):
-        """Some models have their chain ids start from B instead of A. As the code requires the chain ids to be consistent (start from chain A), this function checks and rename the chain ids if necessary
-        """
-        model_path = os.path.join(self.path_to_model,f'{self.predicted_model}.pdb')
-        cmd.load(model_path)
-        chains = cmd.get_chains(f'{self.predicted_model}')
-        if 'C' in chains:
-            # change the chain id into a temporary arbitrary name
-            cmd.alter(f'{self.predicted_model} and chain B', 'chain="tempA"')
-            cmd.sort()
-            cmd.alter(f'{self.predicted_model} and chain C', 'chain="tempB"')
-            cmd.sort()
-            # change the chain id into A and B
-            cmd.alter(f'{self.predicted_model} and chain tempA', 'chain="A"')
-            cmd.sort()
-            cmd.alter(f'{self.predicted_model} and chain tempB', 'chain="B"')
-            cmd.sort()
-            # save and overwrite the predicted model
-            cmd.save(model_path,f'{self.predicted_model}')
-        cmd.reinitialize()
+    def check_chain_id(self, rewrite=False):
+        """Some models have their chain ids start from B instead of A. As the code requires the chain ids to be consistent (start from chain A), this function checks the chain ids and relabels them when the pdb file is read, without PyMOL
 
-    def read_pickle(self):
-        """Read in the pickle file of multimer model
+        Args:
+            rewrite (bool): also rewrite the chain ids in the pdb file, changing only the chain id column of its records
 
         Returns:
-            self.pickle_data (dict): Pickle data of multimer model
+            self.chain_map (dict): old chain id as key and new chain id as value, empty if no relabeling is needed
         """
-        multimer_model_pickle = os.path.join(self.path_to_model,f'result_{self.multimer_model}.pkl')
-        with open(multimer_model_pickle, 'rb') as f:
-            self.pickle_data = pickle.load(f)
+        model_path = os.path.join(self.path_to_model,f'{self.predicted_model}.pdb')
+        self.chain_map = chain_relabeling(read_chain_ids(model_path))
+        if self.chain_map and rewrite:
+            # the pdb file now has chains A and B, so it is read without relabeling
+            rewrite_chain_ids(model_path, self.chain_map)
+            self.chain_map = {}
 
-    def parse_atm_record(self,line):
-        """Get the atm record from pdb file
+    def read_pickle(self):
+        """Read in the pickle data of multimer model, from the feature cache of the prediction folder if it is up to date, otherwise from the pickle file
 
         Returns:
-            record (dict): Dict of parsed pdb information from .pdb file
+            self.pickle_data (dict): Pickle data of multimer model
         """
-        record = defaultdict()
-        record['name'] = line[0:6].strip()
-        record['atm_no'] = int(line[6:11])
-        record['atm_name'] = line[12:16].strip()
-        record['atm_alt'] = line[17]
-        record['res_name'] = line[17:20].strip()
-        record['chain'] = line[21]
-        record['res_no'] = int(line[22:26])
-        record['insert'] = line[26].strip()
-        record['resid'] = line[22:29]
-        record['x'] = float(line[30:38])
-        record['y'] = float(line[38:46])
-        record['z'] = float(line[46:54])
-        record['occ'] = float(line[54:60])
-        record['B'] = float(line[60:66])
+        self.pickle_data = read_model_features(self.path_to_model, self.multimer_model)
 
-        return record
-    
     def read_pdb(self):
         """Read a pdb file predicted with AF and rewritten to conatin all chains
 
@@ -225,31 +193,8 @@ class Predicted_model:
             self.chain_coords (dict): Dict of chain coordination (x,y,z)
             self.chain_plddt (dict): Dict of chain id as key and plddt array as value
         """
-
-        chain_coords, chain_plddt = {}, {}
         model_path = os.path.join(self.path_to_model,f'{self.predicted_model}.pdb')
-
-        with open(model_path, 'r') as file:
-            for line in file:
-                if not line.startswith('ATOM'):
-                    continue
-                record = self.parse_atm_record(line)
-                #Get CB - CA for GLY
-                if record['atm_name']=='CB' or (record['atm_name']=='CA' and record['res_name']=='GLY'):
-                    if record['chain'] in [*chain_coords.keys()]:
-                        chain_coords[record['chain']].append([record['x'],record['y'],record['z']])
-                        chain_plddt[record['chain']].append(record['B'])
-                    else:
-                        chain_coords[record['chain']] = [[record['x'],record['y'],record['z']]]
-                        chain_plddt[record['chain']] = [record['B']]
-
-        #Convert to arrays
-        for chain in chain_coords:
-            chain_coords[chain] = np.array(chain_coords[chain])
-            chain_plddt[chain] = np.array(chain_plddt[chain])
-
-        self.chain_coords = chain_coords
-        self.chain_plddt = chain_plddt
+        self.chain_coords, self.chain_plddt = read_pdb(model_path, chain_map=self.chain_map)
 
     def parse_ptm_iptm(self):
         """Parse the ptm and iptm of a predicted model by using the pickle file of the multimer model where the ptm and iptm can be found
@@ -16,9 +16,17 @@ The original code source by Chop Yan Lee: https://github.com/KatjaLuckLab/AlphaF
 
 #from pymol import cmd
 import numpy as np
-import pandas as pd
-import json, os, pickle, argparse, sys
-from collections import defaultdict
+# pandas is imported by the methods using it, so that the metrics start without waiting for it
+import json, os, argparse, sys, csv, sqlite3
+from multiprocessing import Pool
+# the readers shared with the individual scripts are kept in the individual folder
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'individual'))
+from feature_cache import read_model_features
+from pdb_reader import read_pdb, read_atom_records, split_by_chain, read_chain_ids, chain_relabeling, relabel_chains, rewrite_chain_ids
+from contacts import find_interchain_contacts, find_residue_contacts
+# the fasta reader is shared with the preprocessing scripts
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'preprocessing'))
+from fasta_library import iter_fasta
 
 class Prediction_folder:
     """Class that stores prediction folder information"""
@@ -34,11 +42,13 @@ class Prediction_folder:
         self.prediction_name = os.path.split(self.prediction_folder)[1]
         self.rank_to_model = {}
         self.model_confidences = {}
-        self.fasta_sequence_dict = {'A':'','B':''}
+        # chain id as key and sequence as value, the chains are labeled A, B, C... in the order of the fasta file
+        self.fasta_sequence_dict = {}
+        # start of every chain in the concatenated sequence of all chains, followed by the total length
+        self.chain_offsets = np.zeros(1, dtype=int)
         # instantiate the amount of Predicted_model according to the number of models given as argument, otherwise 5
         self.model_instances = {}
-        if project_name is not None:
-            self.project_name = project_name
+        self.project_name = project_name
         # need an attribute to annotate if a prediction folder has been successfully predicted without internal AlphaFold error
         self.predicted = True
 
@@ -59,15 +69,10 @@ class Prediction_folder:
         """Read the fasta file of the prediction to retrieve information on chain and sequence identity
         """
         fasta_path = f'{self.prediction_folder}.fasta'
-        with open(fasta_path, 'r') as f:
-            lines = [line.strip() for line in f.readlines() if line.strip() != '']
-        chain_id = 0
-        for line in lines:
-            if line[0] == '>':
-                chain = list(self.fasta_sequence_dict)[chain_id]
-                chain_id += 1
-                continue
-            self.fasta_sequence_dict[chain] += line
+        # chains are labeled in the order of the records, homomers repeat the same header
+        for chain_id, (header, sequence) in enumerate(iter_fasta(fasta_path)):
+            self.fasta_sequence_dict[chr(ord('A') + chain_id)] = sequence
+        self.chain_offsets = np.cumsum([0] + [len(sequence) for sequence in self.fasta_sequence_dict.values()])
 
     def instantiate_predicted_model(self):
         """Initialize the amount of Predicted_model instance according to the number of model specified and save it in the dict self.model_instances
@@ -81,6 +86,8 @@ class Prediction_folder:
             model_inst.model_confidence = self.model_confidences.get(model_id)
             model_inst.multimer_model = self.rank_to_model.get(model_id)
             model_inst.path_to_model = self.prediction_folder
+            model_inst.chain_ids = [*self.fasta_sequence_dict.keys()]
+            model_inst.chain_offsets = self.chain_offsets
 
     def process_all_models(self):
         """Use the instances of Predicted_model and run the wrapper function Predicted_model.get_model_independent_metrics function on themselves
@@ -93,72 +100,286 @@ class Prediction_folder:
             for model_id, model_inst in self.model_instances.items():
                 model_inst.get_model_independent_metrics()
     
-    def write_out_calculated_metrics(self, project_name=None):
+    def get_metrics_rows(self):
+        """Assemble the rows of template_indep_info.tsv for the predicted models of this prediction folder
+
+        Returns:
+            rows (list): List of rows, one per predicted model, ordered like Metrics_sink.metrics_columns
+        """
+        chain_lengths = np.diff(self.chain_offsets)
+        common_info = [self.project_name, self.prediction_name, len(self.fasta_sequence_dict.get('A', '')), len(self.fasta_sequence_dict.get('B', '')),
+                       len(chain_lengths), ','.join(str(length) for length in chain_lengths)]
+
+        # check if the prediction folder has been predicted successfully without internal error from AlphaFold
+        if not self.predicted:
+            return [common_info + ['Prediction failed'] + [None] * (len(Metrics_sink.metrics_columns) - len(common_info) - 1)]
+        # insert metric info in a row-wise manner
+        return [common_info + [model_id, model_inst.model_confidence, model_inst.ptm, model_inst.iptm, model_inst.iPAE, model_inst.min_iPAE, model_inst.pairwise_iPAE, model_inst.pairwise_min_iPAE]
+                for model_id, model_inst in self.model_instances.items()]
+
+    def write_out_calculated_metrics(self, project_name=None, metrics_sink=None):
         """
         Write out the information that has been processed for every predicted model.
     
         Args:
             project_name (str): a project name given to model contacts dataframe as a key identifier
+            metrics_sink (Metrics_sink): an opened sink shared by all prediction folders of a run, if None a sink is opened and closed for this folder alone
     
         Returns:
             template_indep_info.tsv: A tsv file with the calculated template independent metrics
         """
-        metrics_out_path = os.path.join(self.path_to_prediction_folder, 'template_indep_info.tsv')
-    
-        # Define the columns and their data types for the DataFrame
-        metrics_columns_dtype = {'project_name': str, 'prediction_name': str, 'chain_A_length': int, 'chain_B_length': int, 'model_id': str, 'model_confidence': float}
-    
-        # Check if template_indep_info.tsv already exists
-        if os.path.exists(metrics_out_path):
-            metrics_df = pd.read_csv(metrics_out_path, sep='\t', index_col=0)
-            metrics_df.reset_index(drop=True, inplace=True)
-        else:
-            metrics_df = pd.DataFrame(columns=metrics_columns_dtype.keys())
-            metrics_df = metrics_df.astype(dtype=metrics_columns_dtype)
-    
-        if self.project_name is not None:
-            common_info = [self.project_name]
-        else:
-            common_info = []
-        common_info += [self.prediction_name, len(self.fasta_sequence_dict.get('A')), len(self.fasta_sequence_dict.get('B'))]
-    
-        # check if the prediction folder has been predicted successfully without internal error from AlphaFold
+        if metrics_sink is not None:
+            metrics_sink.append_rows(self.get_metrics_rows())
+            return
+        metrics_sink = Metrics_sink(self.path_to_prediction_folder)
+        metrics_sink.open()
+        metrics_sink.append_rows(self.get_metrics_rows())
+        metrics_sink.close()
+
+    def write_out_contacts(self, distance=5, max_pae=5):
+        """
+        Write out the residue pairs in contact across chains of every predicted model, reproducing alphafold contacts of ChimeraX without opening the models in ChimeraX.
+
+        Args:
+            distance (float): largest distance between any atoms of two residues in contact in Å
+            max_pae (float): largest PAE of two residues in contact
+
+        Returns:
+            contacts.csv: A csv file in the prediction folder with one row per residue pair in contact of every predicted model
+        """
         if not self.predicted:
-            row = common_info + ['Prediction failed'] + [None] * 3 + [None] * (len(metrics_columns_dtype) - 6)  # Adjust the None values based on column count
-            
-            # Ensure row is in the form of a dictionary with column names as keys
-            row_dict = dict(zip(metrics_df.columns, row))
-            
-            # Check if the row has the same columns as the DataFrame
-            if set(row_dict.keys()) != set(metrics_df.columns):
-                print(f"Column mismatch: {set(row_dict.keys())} vs {set(metrics_df.columns)}")
-                return  # Exit the function or handle the error as needed
-            else:
-                metrics_df.loc[len(metrics_df)] = row_dict
+            return
+        import pandas as pd
+        contacts_dfs = [contacts_df for contacts_df in (model_inst.get_contacts(distance, max_pae) for model_inst in self.model_instances.values()) if contacts_df is not None]
+        if contacts_dfs:
+            contacts_df = pd.concat(contacts_dfs, ignore_index=True)
+        else:
+            contacts_df = pd.DataFrame(columns=Predicted_model.contacts_columns)
+        contacts_df.insert(0, 'prediction_name', self.prediction_name)
+        contacts_df.insert(0, 'project_name', self.project_name)
+        contacts_out_path = os.path.join(self.prediction_folder, 'contacts.csv')
+        contacts_df.to_csv(contacts_out_path, index=False)
+        print(f'Contacts saved in {contacts_out_path}!')
 
+
+class Metrics_sink:
+    """Class that appends the calculated metrics of many prediction folders to template_indep_info.tsv"""
+    metrics_columns = ['project_name', 'prediction_name', 'chain_A_length', 'chain_B_length', 'num_chains', 'chain_lengths', 'model_id', 'model_confidence', 'ptm', 'iptm',
+                       'iPAE', 'min_iPAE', 'pairwise_iPAE', 'pairwise_min_iPAE']
+
+    def __init__(self,path_to_prediction_folder):
+        """Initialize an instance of Metrics_sink
+
+        Args:
+            path_to_prediction_folder (str): path to the folder containing the prediction folders, where the tsv files are written
+        """
+        self.metrics_out_path = os.path.join(path_to_prediction_folder, 'template_indep_info.tsv')
+        self.filtered_out_path = os.path.join(path_to_prediction_folder, 'filtered_template_indep_info.tsv')
+        self.metrics_file = None
+        self.writer = None
+        # index of the next row, template_indep_info.tsv is written with the index as first unnamed column
+        self.next_index = 0
+        # rows before start_index were written by earlier runs, the prediction folders appended in this run replace their rows among them
+        self.start_index = 0
+        self.appended_names = set()
+
+    def open(self):
+        """Open template_indep_info.tsv for appending, writing the header if the file is new. An existing file is read once to count its rows
+        """
+        if os.path.exists(self.metrics_out_path) and os.path.getsize(self.metrics_out_path) > 0:
+            with open(self.metrics_out_path, 'r', newline='') as f:
+                reader = csv.reader(f, delimiter='\t')
+                header = next(reader)[1:]
+                self.next_index = sum(1 for _ in reader)
+            if header != self.metrics_columns:
+                # the file was written with another set of columns, align it once before appending to it
+                import pandas as pd
+                metrics_df = pd.read_csv(self.metrics_out_path, sep='\t', index_col=0)
+                metrics_df = metrics_df.reindex(columns=self.metrics_columns).reset_index(drop=True)
+                metrics_df.to_csv(self.metrics_out_path, sep='\t')
+            self.metrics_file = open(self.metrics_out_path, 'a', newline='')
+            self.writer = csv.writer(self.metrics_file, delimiter='\t', lineterminator='\n')
         else:
-            # insert metric info in a row-wise manner
-            for model_id, model_inst in self.model_instances.items():
-                row = common_info + [model_id, model_inst.model_confidence]  # Add other model-specific metrics as needed
-                metrics_df.loc[len(metrics_df)] = row
-    
+            self.metrics_file = open(self.metrics_out_path, 'w', newline='')
+            self.writer = csv.writer(self.metrics_file, delimiter='\t', lineterminator='\n')
+            self.writer.writerow([''] + self.metrics_columns)
+        self.start_index = self.next_index
+
+    def append_rows(self, rows):
+        """Append rows to template_indep_info.tsv without reading the rows that are already in it
+
+        Args:
+            rows (list): List of rows ordered like self.metrics_columns
+        """
+        for row in rows:
+            self.writer.writerow([self.next_index] + ['' if value is None else value for value in row])
+            self.next_index += 1
+            self.appended_names.add(row[1])
+        # flush so that the rows of finished folders survive an interrupted run
+        self.metrics_file.flush()
+
+    def write_out_filtered_metrics(self):
+        """Materialize filtered_template_indep_info.tsv from the complete template_indep_info.tsv, dropping the outdated rows of reprocessed prediction folders
+
+        Returns:
+            filtered_template_indep_info.tsv: A tsv file with the models that pass the filter
+        """
+        import pandas as pd
+        metrics_df = pd.read_csv(self.metrics_out_path, sep='\t', index_col=0)
+        # prediction folders reprocessed in this run still have their rows of earlier runs before start_index, drop those rows
+        outdated_rows = (np.arange(len(metrics_df)) < self.start_index) & metrics_df['prediction_name'].astype(str).isin(self.appended_names).to_numpy()
+        if outdated_rows.any():
+            metrics_df = metrics_df[~outdated_rows].reset_index(drop=True)
+            metrics_df.to_csv(self.metrics_out_path, sep='\t')
+            self.next_index = len(metrics_df)
         # Filter the DataFrame based on specific criteria (example: model_confidence >= 0.5)
-        filtered_df = metrics_df[metrics_df['model_confidence'] >= 0.5]
-    
-        # Write out the filtered DataFrame to a new file
-        filtered_out_path = os.path.join(self.path_to_prediction_folder, 'filtered_template_indep_info.tsv')
-        filtered_df.to_csv(filtered_out_path, sep='\t', index=False)
-    
-        # Write out the original metrics DataFrame
-        metrics_df.to_csv(metrics_out_path, sep='\t')
-        print(f'Calculated metrics saved in {metrics_out_path}!')
-        print(f'Filtered metrics saved in {filtered_out_path}!')
-    
+        filtered_df = metrics_df[pd.to_numeric(metrics_df['model_confidence'], errors='coerce') >= 0.5]
+        filtered_df.to_csv(self.filtered_out_path, sep='\t', index=False)
+
+    def close(self):
+        """Close template_indep_info.tsv and write out the filtered metrics once
+        """
+        if self.metrics_file is None:
+            return
+        self.metrics_file.close()
+        self.metrics_file = None
+        self.writer = None
+        self.write_out_filtered_metrics()
+        print(f'Calculated metrics saved in {self.metrics_out_path}!')
+        print(f'Filtered metrics saved in {self.filtered_out_path}!')
+
+
+class Resume_index:
+    """Class that records the prediction folders processed in a run in template_indep_info.sqlite, next to template_indep_info.tsv"""
+    def __init__(self,path_to_prediction_folder):
+        """Initialize an instance of Resume_index
+
+        Args:
+            path_to_prediction_folder (str): path to the folder containing the prediction folders, where the index is stored
+        """
+        self.index_path = os.path.join(path_to_prediction_folder, 'template_indep_info.sqlite')
+        self.metrics_out_path = os.path.join(path_to_prediction_folder, 'template_indep_info.tsv')
+        self.connection = None
+        self.entries = {}
+        # fingerprints of the folders seeded from template_indep_info.tsv, written with the next commit
+        self.seeded = {}
+
+    def open(self):
+        """Open the index and load its entries into a dict, checking them against template_indep_info.tsv. The index is emptied if the tsv is missing or has no rows,
+        and if the tsv does not have the number of rows recorded in the index, e.g. it was written before the index existed or edited, only the folders with rows in it are kept
+        """
+        self.connection = sqlite3.connect(self.index_path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS processed_folders (prediction_name TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, status TEXT NOT NULL)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS run_info (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        self.entries = {prediction_name:(fingerprint, status) for prediction_name, fingerprint, status in self.connection.execute('SELECT prediction_name, fingerprint, status FROM processed_folders')}
+        metrics_rows, metrics_names = 0, set()
+        if os.path.exists(self.metrics_out_path) and os.path.getsize(self.metrics_out_path) > 0:
+            with open(self.metrics_out_path, 'r', newline='') as f:
+                for row in csv.DictReader(f, delimiter='\t'):
+                    metrics_rows += 1
+                    metrics_names.add(row['prediction_name'])
+        recorded_rows = self.connection.execute("SELECT value FROM run_info WHERE key = 'metrics_rows'").fetchone()
+        if recorded_rows is not None and int(recorded_rows[0]) == metrics_rows and metrics_rows > 0:
+            return
+        # None marks folders that are known to be processed but whose inputs were not recorded
+        self.entries = {prediction_name:self.entries.get(prediction_name, (None, 'processed')) for prediction_name in metrics_names}
+        self.connection.execute('DELETE FROM processed_folders')
+        self.connection.executemany('INSERT INTO processed_folders (prediction_name, fingerprint, status) VALUES (?, ?, ?)',
+                                    [(prediction_name, fingerprint, status) for prediction_name, (fingerprint, status) in self.entries.items() if fingerprint is not None])
+        self.record_metrics_rows(metrics_rows)
+        self.connection.commit()
+
+    def record_metrics_rows(self, metrics_rows):
+        """Record the number of rows of template_indep_info.tsv the entries of the index correspond to, committed with the next entry
+
+        Args:
+            metrics_rows (int): number of rows of template_indep_info.tsv
+        """
+        self.connection.execute("INSERT OR REPLACE INTO run_info (key, value) VALUES ('metrics_rows', ?)", (str(metrics_rows),))
+
+    def is_up_to_date(self, prediction_name, fingerprint):
+        """Check whether a prediction folder was processed with the inputs it currently has
+
+        Args:
+            prediction_name (str): name of the prediction folder
+            fingerprint (str): fingerprint of the current inputs of the prediction folder, see fingerprint_prediction_folder
+
+        Returns:
+            bool: True if the prediction folder can be skipped
+        """
+        entry = self.entries.get(prediction_name)
+        if entry is None:
+            return False
+        if entry[0] is None:
+            # seeded from template_indep_info.tsv, trust it and record the current inputs with the next commit, not one commit per folder
+            self.entries[prediction_name] = (fingerprint, entry[1])
+            self.seeded[prediction_name] = (fingerprint, entry[1])
+            return True
+        return entry[0] == fingerprint
+
+    def record(self, prediction_name, fingerprint, status, metrics_rows=None):
+        """Record a processed prediction folder in the index
+
+        Args:
+            prediction_name (str): name of the prediction folder
+            fingerprint (str): fingerprint of the inputs the prediction folder was processed with
+            status (str): processed or failed
+            metrics_rows (int): number of rows of template_indep_info.tsv once the rows of the folder are written, None if they did not change
+        """
+        self.entries[prediction_name] = (fingerprint, status)
+        self.connection.execute('INSERT OR REPLACE INTO processed_folders (prediction_name, fingerprint, status) VALUES (?, ?, ?)', (prediction_name, fingerprint, status))
+        if metrics_rows is not None:
+            self.record_metrics_rows(metrics_rows)
+        self.write_seeded()
+        self.connection.commit()
+
+    def write_seeded(self):
+        """Write the fingerprints of the seeded folders in one statement, committed with the next entry or when the index is closed
+        """
+        self.connection.executemany('INSERT OR REPLACE INTO processed_folders (prediction_name, fingerprint, status) VALUES (?, ?, ?)',
+                                    [(prediction_name, fingerprint, status) for prediction_name, (fingerprint, status) in self.seeded.items()])
+        self.seeded = {}
+
+    def close(self, metrics_rows=None):
+        """Close the index
 
+        Args:
+            metrics_rows (int): final number of rows of template_indep_info.tsv, once the outdated rows are dropped
+        """
+        if self.connection is not None:
+            if metrics_rows is not None:
+                self.record_metrics_rows(metrics_rows)
+            self.write_seeded()
+            self.connection.commit()
+            self.connection.close()
+            self.connection = None
+
+
+def fingerprint_prediction_folder(prediction_folder):
+    """Summarize the inputs of a prediction folder by the modification time and size of its ranking_debug.json, result pickles and fasta file
+
+    Args:
+        prediction_folder (str): absolute path to the prediction folder
+
+    Returns:
+        fingerprint (str): json string that changes whenever one of the inputs changes
+    """
+    inputs = []
+    for entry in os.scandir(prediction_folder):
+        if entry.name == 'ranking_debug.json' or (entry.name.startswith('result_') and entry.name.endswith('.pkl')):
+            stat = entry.stat()
+            inputs.append([entry.name, stat.st_mtime_ns, stat.st_size])
+    fasta_path = f'{prediction_folder}.fasta'
+    if os.path.exists(fasta_path):
+        stat = os.stat(fasta_path)
+        inputs.append([os.path.basename(fasta_path), stat.st_mtime_ns, stat.st_size])
+    return json.dumps(sorted(inputs))
 
 
 class Predicted_model:
     """Class that stores predicted model"""
+    contacts_columns = ['model_id', 'chain_1', 'residue_1', 'residue_name_1', 'chain_2', 'residue_2', 'residue_name_2', 'distance', 'pae']
+
     def __init__(self,predicted_model):
         """Initialize an instance of Predicted_model
         
@@ -172,41 +393,45 @@ class Predicted_model:
         self.chain_plddt = None
         self.pickle_data = None
         self.model_confidence = None
+        self.ptm = None
+        self.iptm = None
+        self.chain_map = {}
+        self.chain_ids = None
+        self.chain_offsets = None
+        self.iPAE = None
+        self.min_iPAE = None
+        self.pairwise_iPAE = None
+        self.pairwise_min_iPAE = None
 
-    def read_pickle(self):
-        """Read in the pickle file of multimer model
+    def check_chain_id(self, rewrite=False):
+        """Some models have their chain ids start from B instead of A. As the code requires the chain ids to be consistent (start from chain A), this function checks the chain ids and relabels them when the pdb file is read
+
+        Args:
+            rewrite (bool): also rewrite the chain ids in the pdb file, changing only the chain id column of its records
 
         Returns:
-            self.pickle_data (dict): Pickle data of multimer model
+            self.chain_map (dict): old chain id as key and new chain id as value, empty if no relabeling is needed
         """
-        multimer_model_pickle = os.path.join(self.path_to_model,f'result_{self.multimer_model}.pkl')
-        with open(multimer_model_pickle, 'rb') as f:
-            self.pickle_data = pickle.load(f)
+        model_path = os.path.join(self.path_to_model,f'{self.predicted_model}.pdb')
+        if not os.path.exists(model_path):
+            return
+        self.chain_map = chain_relabeling(read_chain_ids(model_path))
+        if self.chain_map and rewrite:
+            # the pdb file now has chains A and B, so it is read without relabeling
+            rewrite_chain_ids(model_path, self.chain_map)
+            self.chain_map = {}
+
+    def read_pickle(self, scalars_only=False):
+        """Read in the pickle data of multimer model, the scalars from the feature cache of the prediction folder if it is up to date and the PAE always from the pickle file
 
-    def parse_atm_record(self,line):
-        """Get the atm record from pdb file
+        Args:
+            scalars_only (bool): only read the scalar confidences and the plddt, skipping the PAE
 
         Returns:
-            record (dict): Dict of parsed pdb information from .pdb file
-        """
-        record = defaultdict()
-        record['name'] = line[0:6].strip()
-        record['atm_no'] = int(line[6:11])
-        record['atm_name'] = line[12:16].strip()
-        record['atm_alt'] = line[17]
-        record['res_name'] = line[17:20].strip()
-        record['chain'] = line[21]
-        record['res_no'] = int(line[22:26])
-        record['insert'] = line[26].strip()
-        record['resid'] = line[22:29]
-        record['x'] = float(line[30:38])
-        record['y'] = float(line[38:46])
-        record['z'] = float(line[46:54])
-        record['occ'] = float(line[54:60])
-        record['B'] = float(line[60:66])
-
-        return record
-    
+            self.pickle_data (dict): Pickle data of multimer model
+        """
+        self.pickle_data = read_model_features(self.path_to_model, self.multimer_model, with_pae=not scalars_only)
+
     def read_pdb(self):
         """Read a pdb file predicted with AF and rewritten to conatin all chains
 
@@ -214,31 +439,81 @@ class Predicted_model:
             self.chain_coords (dict): Dict of chain coordination (x,y,z)
             self.chain_plddt (dict): Dict of chain id as key and plddt array as value
         """
+        model_path = os.path.join(self.path_to_model,f'{self.predicted_model}.pdb')
+        self.chain_coords, self.chain_plddt = read_pdb(model_path, chain_map=self.chain_map)
+
+    def read_pae(self):
+        """Read the PAE matrix of the multimer model, from the pickle data if it was read with the PAE, otherwise from the pickle file, falling back to the pae json written by AlphaFold
+
+        Returns:
+            pae (np.array): PAE matrix of the multimer model, None if neither the pickle nor the pae json is found
+        """
+        if self.pickle_data is not None and self.pickle_data.get('predicted_aligned_error') is not None:
+            return np.asarray(self.pickle_data['predicted_aligned_error'])
+        if os.path.exists(os.path.join(self.path_to_model,f'result_{self.multimer_model}.pkl')):
+            pae = read_model_features(self.path_to_model, self.multimer_model).get('predicted_aligned_error')
+            if pae is not None:
+                return np.asarray(pae)
+        pae_path = os.path.join(self.path_to_model,f'pae_{self.multimer_model}.json')
+        if os.path.exists(pae_path):
+            with open(pae_path, 'r') as f:
+                data = json.load(f)
+            # AlphaFold writes the PAE json as a list holding a single dict
+            if isinstance(data, list):
+                data = data[0]
+            return np.asarray(data['predicted_aligned_error'], dtype=float)
+        return None
+
+    def get_contacts(self, distance=5, max_pae=5):
+        """Find the residue pairs of different chains in contact in the predicted model like alphafold contacts of ChimeraX, that is with any atoms within the distance and a PAE of the residue of the second chain, aligned on the residue of the first chain, of at most max_pae
+
+        Args:
+            distance (float): largest distance between any atoms of two residues in contact in Å
+            max_pae (float): largest PAE of two residues in contact
 
-        chain_coords, chain_plddt = {}, {}
+        Returns:
+            contacts_df (pd.DataFrame): one row per residue pair in contact with the columns of self.contacts_columns, None if the model or its PAE is missing
+        """
         model_path = os.path.join(self.path_to_model,f'{self.predicted_model}.pdb')
+        if self.multimer_model is None or not os.path.exists(model_path):
+            return None
+        pae = self.read_pae()
+        if pae is None:
+            print(f'No PAE found for {os.path.join(self.path_to_model,self.predicted_model)}, contacts not written out')
+            return None
+        atoms = read_atom_records(model_path)
+        if self.chain_map:
+            atoms['chain'] = relabel_chains(atoms['chain'], self.chain_map)
+        # number the residues in the order of the model, which is the order of the rows and columns of the PAE
+        new_residue = np.ones(len(atoms['chain']), dtype=bool)
+        new_residue[1:] = (atoms['chain'][1:] != atoms['chain'][:-1]) | (atoms['res_no'][1:] != atoms['res_no'][:-1])
+        residue_index = np.cumsum(new_residue) - 1
+        if len(residue_index) == 0 or residue_index[-1] + 1 != len(pae):
+            print(f'Residues of {os.path.join(self.path_to_model,self.predicted_model)} do not match its PAE, contacts not written out')
+            return None
+        first_atom = np.flatnonzero(new_residue)
+        residue_chain, residue_no, residue_name = atoms['chain'][first_atom], atoms['res_no'][first_atom], atoms['res_name'][first_atom]
 
-        with open(model_path, 'r') as file:
-            for line in file:
-                if not line.startswith('ATOM'):
-                    continue
-                record = self.parse_atm_record(line)
-                #Get CB - CA for GLY
-                if record['atm_name']=='CB' or (record['atm_name']=='CA' and record['res_name']=='GLY'):
-                    if record['chain'] in [*chain_coords.keys()]:
-                        chain_coords[record['chain']].append([record['x'],record['y'],record['z']])
-                        chain_plddt[record['chain']].append(record['B'])
-                    else:
-                        chain_coords[record['chain']] = [[record['x'],record['y'],record['z']]]
-                        chain_plddt[record['chain']] = [record['B']]
-
-        #Convert to arrays
-        for chain in chain_coords:
-            chain_coords[chain] = np.array(chain_coords[chain])
-            chain_plddt[chain] = np.array(chain_plddt[chain])
-
-        self.chain_coords = chain_coords
-        self.chain_plddt = chain_plddt
+        chain_atoms = split_by_chain(atoms['chain'], np.arange(len(residue_index)))[0]
+        chains = [*chain_atoms.keys()]
+        residue_pairs, distances = [], []
+        for i, chain_1 in enumerate(chains):
+            for chain_2 in chains[i + 1:]:
+                atoms_1, atoms_2 = chain_atoms[chain_1], chain_atoms[chain_2]
+                pairs, pair_distances = find_residue_contacts(atoms['coords'][atoms_1], residue_index[atoms_1], atoms['coords'][atoms_2], residue_index[atoms_2], distance)
+                residue_pairs.append(pairs)
+                distances.append(pair_distances)
+        if not residue_pairs:
+            return None
+        residue_pairs, distances = np.concatenate(residue_pairs), np.concatenate(distances)
+        pair_pae = pae[residue_pairs[:, 0], residue_pairs[:, 1]]
+        keep = pair_pae <= max_pae
+        residue_1, residue_2 = residue_pairs[keep, 0], residue_pairs[keep, 1]
+        import pandas as pd
+        return pd.DataFrame({'model_id':self.predicted_model,
+                             'chain_1':residue_chain[residue_1], 'residue_1':residue_no[residue_1], 'residue_name_1':residue_name[residue_1],
+                             'chain_2':residue_chain[residue_2], 'residue_2':residue_no[residue_2], 'residue_name_2':residue_name[residue_2],
+                             'distance':distances[keep], 'pae':pair_pae[keep]}, columns=self.contacts_columns)
 
     def parse_ptm_iptm(self):
         """Parse the ptm and iptm of a predicted model by using the pickle file of the multimer model where the ptm and iptm can be found
@@ -250,20 +525,175 @@ class Predicted_model:
         self.ptm = float(self.pickle_data['ptm'])
         self.iptm = float(self.pickle_data['iptm'])
 
+    def calculate_iPAE(self, contact_threshold=8):
+        """Calculate the interface PAE from the PAE matrix of the pickle data, restricted to the residue pairs of different chains in contact in the predicted model
+        The chain boundaries are taken from the chain offsets of the fasta file, and both directions of the PAE, aligned on either chain, are used.
+        Every pair of chains in contact gets its own iPAE, computed for all pairs at once
+
+        Args:
+            contact_threshold (float): distance threshold between CB atoms (CA for GLY) of residues in contact in Å
+
+        Returns:
+            iPAE (float): mean PAE of the residue pairs in contact across chains, saved as attribute of self, nan if there is no contact
+            min_iPAE (float): lowest PAE of the residue pairs in contact across chains, saved as attribute of self, nan if there is no contact
+            pairwise_iPAE (str): iPAE of every pair of chains in contact like A-B:4.210,A-C:12.532, saved as attribute of self
+            pairwise_min_iPAE (str): min_iPAE of every pair of chains in contact, saved as attribute of self
+        """
+        self.iPAE = np.nan
+        self.min_iPAE = np.nan
+        pae = self.pickle_data.get('predicted_aligned_error')
+        if pae is None or not os.path.exists(os.path.join(self.path_to_model,f'{self.predicted_model}.pdb')):
+            return
+        self.read_pdb()
+        chains = [*self.chain_coords.keys()]
+        chain_sizes = [len(self.chain_coords[chain]) for chain in chains]
+        # the residues of the model have to line up with the fasta file and the PAE matrix to map the contacts onto the PAE
+        chain_lengths = np.diff(self.chain_offsets)
+        if chain_sizes != chain_lengths.tolist() or self.chain_offsets[-1] != len(pae):
+            print(f'Chain lengths of {os.path.join(self.path_to_model,self.predicted_model)} do not match the fasta file, iPAE not calculated')
+            return
+        coords = np.concatenate([self.chain_coords[chain] for chain in chains])
+        num_chains = len(chain_lengths)
+        chain_index = np.repeat(np.arange(num_chains), chain_lengths)
+        contacts, _ = find_interchain_contacts(coords, chain_index, contact_threshold)
+        if len(contacts) == 0:
+            return
+        # gather the off-diagonal blocks of the PAE at the contacts, in both directions, in one pass
+        interface_pae = np.concatenate([pae[contacts[:, 0], contacts[:, 1]], pae[contacts[:, 1], contacts[:, 0]]])
+        self.iPAE = float(interface_pae.mean())
+        self.min_iPAE = float(interface_pae.min())
+
+        # reduce the PAE of every pair of chains at once, the first residue of a contact is always on the chain of lower index
+        chain_pair = np.tile(chain_index[contacts[:, 0]] * num_chains + chain_index[contacts[:, 1]], 2)
+        order = np.argsort(chain_pair, kind='stable')
+        chain_pairs, starts, counts = np.unique(chain_pair[order], return_index=True, return_counts=True)
+        pair_mean = np.add.reduceat(interface_pae[order], starts) / counts
+        pair_min = np.minimum.reduceat(interface_pae[order], starts)
+        pair_names = [f'{self.chain_ids[pair // num_chains]}-{self.chain_ids[pair % num_chains]}' for pair in chain_pairs]
+        self.pairwise_iPAE = ','.join(f'{name}:{value:.3f}' for name, value in zip(pair_names, pair_mean))
+        self.pairwise_min_iPAE = ','.join(f'{name}:{value:.3f}' for name, value in zip(pair_names, pair_min))
+
     def get_model_independent_metrics(self):
         """Wraps all the functions together to process a predicted model
 
         Returns:
             None
         """
-        # self.parse_ptm_iptm() # skipped for now because the pickle file has JAX dependency and I am not sure what to do with it
-        #self.check_chain_id()
-        if 'multimer_v2' in self.multimer_model:
-            if os.path.exists(os.path.join(self.path_to_model,f'result_{self.multimer_model}.pkl')):
-                self.read_pickle()
+        self.check_chain_id()
+        if os.path.exists(os.path.join(self.path_to_model,f'result_{self.multimer_model}.pkl')):
+            # the PAE is only needed for the iPAE, otherwise the scalar-only reader skips the large arrays and does not need JAX to read the pickle
+            calculate_iPAE = 'multimer_v2' in self.multimer_model
+            self.read_pickle(scalars_only=not calculate_iPAE)
+            self.parse_ptm_iptm()
+            if calculate_iPAE:
                 self.calculate_iPAE()
         print(f'{os.path.join(self.path_to_model,self.predicted_model)} processed!')
 
+def process_prediction_folder(task):
+    """Process a single prediction folder, meant to be run inside a worker process of the pool in main. A folder that raises is reported instead of stopping the other folders
+
+    Args:
+        task (tuple): absolute path to the prediction folder, project name and whether contacts should be written out
+
+    Returns:
+        file_abs (str): absolute path to the prediction folder
+        folder (Prediction_folder): the processed instance, with the pickle data and coordinates of its models dropped to keep the transfer back to the writer small, None if processing failed
+        error (str): the error that stopped the processing of the folder, None if it was processed
+    """
+    file_abs, project_name, write_contacts = task
+    try:
+        folder = Prediction_folder(file_abs,num_model=5,project_name=project_name)
+        folder.process_all_models()
+        if write_contacts:
+            folder.write_out_contacts()
+    except Exception as error:
+        return file_abs, None, f'{type(error).__name__}: {error}'
+    for model_inst in folder.model_instances.values():
+        model_inst.pickle_data = None
+        model_inst.chain_coords = None
+        model_inst.chain_plddt = None
+    return file_abs, folder, None
+
+def record_prediction_folder(result, project_name, metrics_sink, resume_index, fingerprint):
+    """Write out the metrics of a processed prediction folder and record it in the resume index. A folder that failed to be processed gets a single
+    Processing failed row, replacing its rows of an earlier run, and is recorded as failed with its fingerprint so that it is retried only once its inputs change
+
+    Args:
+        result (tuple): the result of process_prediction_folder
+        project_name (str): optional name for the project
+        metrics_sink (Metrics_sink): opened sink of the run
+        resume_index (Resume_index): opened index of the run
+        fingerprint (str): fingerprint of the inputs the prediction folder was processed with
+    """
+    file_abs, folder, error = result
+    prediction_name = os.path.basename(file_abs)
+    if error is not None:
+        print(f'{file_abs} failed, {error}')
+        metrics_sink.append_rows([[project_name, prediction_name] + [None] * 4 + ['Processing failed'] + [None] * (len(Metrics_sink.metrics_columns) - 7)])
+        resume_index.record(prediction_name, fingerprint, 'failed', metrics_sink.next_index)
+        return
+    folder.write_out_calculated_metrics(metrics_sink=metrics_sink)
+    resume_index.record(folder.prediction_name, fingerprint, 'processed' if folder.predicted else 'failed', metrics_sink.next_index)
+
+def select_prediction_folders(run_path, resume_index, require_fasta=False):
+    """List the prediction folders of a run that still need to be processed
+
+    Args:
+        run_path (str): path to the folder containing the prediction folders
+        resume_index (Resume_index): opened index of the prediction folders already processed in this run
+        require_fasta (bool): skip the folders without a fasta file next to them
+
+    Returns:
+        folder_fingerprints (dict): absolute path of the prediction folders to process and the fingerprint of their inputs, in sorted order
+    """
+    folder_fingerprints = {}
+    # sort the folders so that the order of the rows does not depend on the file system
+    for file in sorted(os.listdir(run_path)):
+        file_abs = os.path.join(run_path,file)
+        if not os.path.isdir(file_abs):
+            continue
+        if require_fasta and not os.path.exists(os.path.join(run_path,f"{file}.fasta")):
+            print(f"Skipping the folder named {file}")
+            continue
+        fingerprint = fingerprint_prediction_folder(file_abs)
+        if resume_index.is_up_to_date(file, fingerprint):
+            continue
+        folder_fingerprints[file_abs] = fingerprint
+    return folder_fingerprints
+
+def process_prediction_folders(path_to_prediction_folder, project_name=None, write_contacts=False, workers=1, require_fasta=False):
+    """Process the prediction folders of a run that are new or whose inputs changed since the last run, optionally across a pool of worker processes, and write out the metrics from this process only
+
+    Args:
+        path_to_prediction_folder (str): path to the folder containing the prediction folders, where the tsv files and the resume index are written
+        project_name (str): optional name for the project
+        write_contacts (bool): whether the contacts should be written out for every prediction folder
+        workers (int): number of worker processes, 1 processes the folders in this process
+        require_fasta (bool): skip the folders without a fasta file next to them
+    """
+    resume_index = Resume_index(path_to_prediction_folder)
+    resume_index.open()
+    folder_fingerprints = select_prediction_folders(path_to_prediction_folder, resume_index, require_fasta=require_fasta)
+    tasks = [(file_abs, project_name, write_contacts) for file_abs in folder_fingerprints]
+    metrics_sink = Metrics_sink(path_to_prediction_folder)
+    metrics_sink.open()
+    try:
+        if workers > 1 and len(tasks) > 1:
+            with Pool(processes=min(workers, len(tasks))) as pool:
+                # imap keeps the order of the tasks so that the rows are written in the same order as a serial run
+                for result in pool.imap(process_prediction_folder, tasks):
+                    record_prediction_folder(result, project_name, metrics_sink, resume_index, folder_fingerprints[result[0]])
+        else:
+            for task in tasks:
+                result = process_prediction_folder(task)
+                record_prediction_folder(result, project_name, metrics_sink, resume_index, folder_fingerprints[result[0]])
+    finally:
+        try:
+            metrics_sink.close()
+        finally:
+            # the tsv loses the outdated rows of reprocessed folders when the sink is closed
+            resume_index.close(metrics_sink.next_index)
+
 def main():
     """Parse arguments and wraps all functions into main for executing the program in such a way that it can handle multiple run ids given to it
     """
@@ -273,54 +703,26 @@ def main():
     parser.add_argument('-path_to_prediction', type=str, help='Path to the prediction folder "/" at the end', dest='path_to_prediction')
     parser.add_argument('-project_name', type=str, help='Optional name for the project', dest='project_name')
     parser.add_argument('-skip_write_out_contacts', action='store_true', help='Exclude writing out  found in predicted models', dest='skip_write_out_contacts')
+    parser.add_argument('-workers', '--workers', type=int, default=1, help='Number of worker processes used to process the prediction folders in parallel, default 1', dest='workers')
     args = parser.parse_args()
     run_ids = vars(args)['run_ids']
     path_to_run = vars(args)['path_to_run']
     path_to_prediction = vars(args)['path_to_prediction']
     project_name = vars(args)['project_name']
     skip_contacts = vars(args)['skip_write_out_contacts']
-
-    # a list to contains already processed files
-    calculated_files = []
+    workers = vars(args)['workers']
 
     # check which argument, -path_to_run or -path_to_prediction, is provided
+    # already processed folders are skipped using the resume index, template_indep_info.sqlite, kept next to template_indep_info.tsv
     if (path_to_run is None) and (path_to_prediction is None):
         print('Please provide either -path_to_run or -path_to_prediction and try again!')
         sys.exit()
     elif path_to_prediction is not None:
-        if os.path.exists(f'{path_to_prediction}template_indep_info.tsv'):
-            temp = pd.read_csv(f'{path_to_prediction}template_indep_info.tsv',sep='\t',index_col=0)
-            calculated_files = temp['prediction_name'].unique()
-        for file in os.listdir(path_to_prediction):
-            if file in calculated_files:
-                # print(file)
-                continue
-            file_abs = os.path.join(path_to_prediction,file)
-            if os.path.isdir(file_abs):
-                folder = Prediction_folder(file_abs,num_model=5,project_name=project_name)
-                folder.process_all_models()
-                folder.write_out_calculated_metrics()
+        process_prediction_folders(path_to_prediction,project_name=project_name,workers=workers)
     else:
         for run_id in run_ids.split(','):
-            if os.path.exists(f'{path_to_run}run{run_id}/template_indep_info.tsv'):
-                temp = pd.read_csv(f'{path_to_run}run{run_id}/template_indep_info.tsv',sep='\t',index_col=0)
-                calculated_files = temp['prediction_name'].unique()
             run_path = f'{path_to_run}run{run_id}'
-            for file in os.listdir(run_path):
-                if file in calculated_files:
-                    # print(file)
-                    continue
-                file_abs = os.path.join(run_path,file)
-                if os.path.isdir(file_abs):
-                    if not os.path.exists(os.path.join(run_path,f"{file}.fasta")):
-                        print(f"Skipping the folder named {file}")
-                        continue
-                    folder = Prediction_folder(file_abs,num_model=5,project_name=project_name)
-                    folder.process_all_models()
-                    folder.write_out_calculated_metrics()
-                    if skip_contacts:
-                        continue
-                    folder.write_out_contacts()
+            process_prediction_folders(run_path,project_name=project_name,write_contacts=not skip_contacts,workers=workers,require_fasta=True)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This script writes out the contacts of a screen with ChimeraX by splitting the prediction folders of a run across several
+ChimeraX processes started without a GUI, each running the openalphafoldfolders command of run_chimerax_contacts in
+batch mode on its own shard of the folders.
+
+Usage: python launch_chimerax_contacts.py -path_to_run <folder with prediction folders> [-num_shards 4] [-chimerax chimerax]
+Output: contacts.csv in every prediction folder and chimerax_contacts_shard_<i>.log in the run folder
+"""
+
+import argparse
+import os
+import subprocess
+
+CONTACTS_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'run_chimerax_contacts')
+
+
+def build_chimerax_command(chimerax, path_to_run, shard, num_shards):
+    """
+    Build the command line of one headless ChimeraX process.
+
+    Args:
+    chimerax (str): ChimeraX executable.
+    path_to_run (str): Path to the folder containing the prediction folders.
+    shard (int): Index of the shard of folders processed by this process.
+    num_shards (int): Number of processes the folders are split across.
+
+    Returns:
+    list: The command line.
+    """
+    commands = f'open {CONTACTS_SCRIPT} format python; openalphafoldfolders directory {os.path.abspath(path_to_run)} batch true shard {shard} numShards {num_shards}'
+    return [chimerax, '--nogui', '--exit', '--cmd', commands]
+
+
+def run_shards(chimerax, path_to_run, num_shards):
+    """
+    Start one headless ChimeraX process per shard and wait for all of them.
+
+    Args:
+    chimerax (str): ChimeraX executable.
+    path_to_run (str): Path to the folder containing the prediction folders.
+    num_shards (int): Number of ChimeraX processes.
+
+    Returns:
+    list: Return code of every shard.
+    """
+    processes = []
+    for shard in range(num_shards):
+        log_file = open(os.path.join(path_to_run, f'chimerax_contacts_shard_{shard}.log'), 'w')
+        processes.append((subprocess.Popen(build_chimerax_command(chimerax, path_to_run, shard, num_shards), stdout=log_file, stderr=subprocess.STDOUT), log_file))
+    return_codes = []
+    for process, log_file in processes:
+        return_codes.append(process.wait())
+        log_file.close()
+    return return_codes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write out the contacts of a screen with several headless ChimeraX processes.')
+    parser.add_argument('-path_to_run', type=str, required=True, help='Path to the folder containing the prediction folders', dest='path_to_run')
+    parser.add_argument('-num_shards', type=int, default=os.cpu_count(), help='Number of ChimeraX processes, default the number of CPUs', dest='num_shards')
+    parser.add_argument('-chimerax', type=str, default='chimerax', help='ChimeraX executable, default chimerax', dest='chimerax')
+    args = parser.parse_args()
+
+    return_codes = run_shards(args.chimerax, args.path_to_run, max(1, args.num_shards))
+    for shard, return_code in enumerate(return_codes):
+        if return_code != 0:
+            print(f'Shard {shard} failed with return code {return_code}, see chimerax_contacts_shard_{shard}.log')
+    print(f'Contacts written out with {len(return_codes)} ChimeraX processes!')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This script scores every ranked_*.pdb and unrelaxed_*.pdb model of every prediction folder of a screen with pDockQ,
+in batches of models spread over a pool of worker processes, and writes a single table keyed by prediction and model.
+
+Usage: python pdockq_screen.py -path_to_run <folder with prediction folders> [-workers N] [-batch_size 50]
+Output: pdockq_screen.csv in the run folder with the columns prediction_name, model, pdb_file, pdockq and ppv
+"""
+
+import argparse
+import csv
+import os
+import sys
+from multiprocessing import Pool
+# the readers shared with the individual scripts are kept in the individual folder
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'individual'))
+from pdockq import score_pdb
+
+MODEL_PREFIXES = ('ranked_', 'unrelaxed_')
+
+
+def discover_models(run_path):
+    """
+    Find the predicted models of every prediction folder of a run.
+
+    Args:
+    run_path (str): Path to the folder containing the prediction folders.
+
+    Returns:
+    list: Tuples of prediction name, model name and path to the pdb file, sorted by prediction and model.
+    """
+    models = []
+    for prediction_name in sorted(os.listdir(run_path)):
+        prediction_folder = os.path.join(run_path, prediction_name)
+        if not os.path.isdir(prediction_folder):
+            continue
+        for file_name in sorted(os.listdir(prediction_folder)):
+            if file_name.startswith(MODEL_PREFIXES) and file_name.endswith('.pdb'):
+                models.append((prediction_name, file_name[:-len('.pdb')], os.path.join(prediction_folder, file_name)))
+    return models
+
+
+def score_batch(task):
+    """
+    Score a batch of models with pDockQ, meant to be run inside a worker process.
+
+    Args:
+    task (tuple): List of models as returned by discover_models and the distance threshold.
+
+    Returns:
+    list: One row per model with the prediction name, model, pdb file, pdockq and ppv, models with a single chain are left out.
+    """
+    models, threshold = task
+    rows = []
+    for prediction_name, model, pdb_file in models:
+        score = score_pdb(pdb_file, threshold)
+        if score is not None:
+            rows.append([prediction_name, model, os.path.basename(pdb_file), score['pdockq'], score['ppv']])
+    return rows
+
+
+def score_screen(run_path, output_path, workers=1, batch_size=50, threshold=8):
+    """
+    Score all models of a screen and write the consolidated pDockQ table.
+
+    Args:
+    run_path (str): Path to the folder containing the prediction folders.
+    output_path (str): Path to the csv file the table is written to.
+    workers (int): Number of worker processes.
+    batch_size (int): Number of models scored per task sent to a worker.
+    threshold (float): Distance threshold between CB atoms in Å.
+
+    Returns:
+    int: Number of models scored.
+    """
+    models = discover_models(run_path)
+    tasks = [(models[i:i + batch_size], threshold) for i in range(0, len(models), batch_size)]
+    num_scored = 0
+    with open(output_path, 'w', newline='') as output_file:
+        writer = csv.writer(output_file)
+        writer.writerow(['prediction_name', 'model', 'pdb_file', 'pdockq', 'ppv'])
+        with Pool(processes=max(1, workers)) as pool:
+            # imap keeps the order of the batches, so the table is sorted by prediction and model
+            for rows in pool.imap(score_batch, tasks):
+                writer.writerows(rows)
+                num_scored += len(rows)
+    return num_scored
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score every model of a screen with pDockQ and write one consolidated table.')
+    parser.add_argument('-path_to_run', type=str, required=True, help='Path to the folder containing the prediction folders', dest='path_to_run')
+    parser.add_argument('-output', type=str, help='Path to the output csv, default pdockq_screen.csv in the run folder', dest='output')
+    parser.add_argument('-workers', '--workers', type=int, default=1, help='Number of worker processes, default 1', dest='workers')
+    parser.add_argument('-batch_size', type=int, default=50, help='Number of models scored per task sent to a worker, default 50', dest='batch_size')
+    parser.add_argument('-threshold', type=float, default=8, help='Distance threshold between CB atoms in Å, default 8', dest='threshold')
+    args = parser.parse_args()
+
+    output_path = args.output if args.output is not None else os.path.join(args.path_to_run, 'pdockq_screen.csv')
+    num_scored = score_screen(args.path_to_run, output_path, workers=args.workers, batch_size=args.batch_size, threshold=args.threshold)
+    print(f'{num_scored} models scored, pDockQ table saved in {output_path}!')
+
+
+if __name__ == "__main__":
+    main()
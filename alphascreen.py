@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Single entry point for the AlphaScreen tools. Every subcommand runs the main function of one of the scripts with the
+remaining arguments, and the script is only imported once its subcommand is chosen, so that a subcommand does not
+pay for the imports of the others.
+
+Usage: python alphascreen.py <subcommand> [arguments of the subcommand]
+       python alphascreen.py <subcommand> -h shows the arguments of a subcommand
+"""
+
+import importlib
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# subcommand: (folder of the script, module name, description)
+SUBCOMMANDS = {
+    'metrics': ('all', 'iptm_only_nopymol', 'Calculate the template independent metrics of the prediction folders of a run'),
+    'analysis': ('all', 'iptm_analysis', 'Calculate the metrics of a prediction folder and plot the PAE of the filtered models'),
+    'features': ('individual', 'feature_cache', 'Extract the features of the result pickles into a cache per prediction folder'),
+    'pdockq': ('all', 'pdockq_screen', 'Score every model of a screen with pDockQ'),
+    'plots': ('individual', 'pae', 'Write the model statistics and the PAE, pLDDT and MSA plots of a prediction folder or of a whole run'),
+    'generate-pae': ('all', 'generate_PAE', 'Score with pDockQ and plot the prediction folders that pass the iptm_only.py filter'),
+    'chimerax-contacts': ('all', 'launch_chimerax_contacts', 'Write out the contacts of a screen with headless ChimeraX processes'),
+}
+
+
+def print_usage():
+    """
+    Print the subcommands and their descriptions.
+    """
+    print('usage: alphascreen.py <subcommand> [arguments]\n\nsubcommands:')
+    for subcommand, (_, _, description) in SUBCOMMANDS.items():
+        print(f'  {subcommand:<18} {description}')
+
+
+def run_subcommand(subcommand, arguments):
+    """
+    Import the script of a subcommand and run its main function with the given arguments.
+
+    Args:
+    subcommand (str): Name of the subcommand, a key of SUBCOMMANDS.
+    arguments (list): Command line arguments passed on to the script.
+    """
+    folder, module_name, _ = SUBCOMMANDS[subcommand]
+    sys.path.insert(0, os.path.join(ROOT, folder))
+    module = importlib.import_module(module_name)
+    # the scripts parse sys.argv themselves
+    sys.argv = [f'alphascreen.py {subcommand}'] + arguments
+    module.main()
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] in ('-h', '--help'):
+        print_usage()
+        return
+    subcommand = sys.argv[1]
+    if subcommand not in SUBCOMMANDS:
+        print(f'Unknown subcommand {subcommand}\n')
+        print_usage()
+        sys.exit(2)
+    run_subcommand(subcommand, sys.argv[2:])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark the NumPy PDB reader of individual/pdb_reader.py against the line by line parser it replaced.
+
+A synthetic complex with the requested number of residues per chain is written to a temporary pdb file, read with
+both parsers, and the results are checked to be identical before the timings are reported.
+
+Usage: python bench_pdb_reader.py [-chains 4] [-residues 2000] [-repeats 3]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'individual'))
+from pdb_reader import read_pdb
+
+RESIDUES = ['ALA', 'GLY', 'LEU', 'SER', 'LYS', 'ASP', 'PHE', 'TRP']
+
+
+def write_synthetic_complex(pdbfile, num_chains, num_residues):
+    """Write a pdb file with num_chains chains of num_residues residues, with backbone, CB and a few side chain atoms"""
+    rng = np.random.default_rng(0)
+    atom_no = 1
+    with open(pdbfile, 'w') as f:
+        for chain_index in range(num_chains):
+            chain = chr(ord('A') + chain_index)
+            for res_no in range(1, num_residues + 1):
+                res_name = RESIDUES[res_no % len(RESIDUES)]
+                atom_names = ['N', 'CA', 'C', 'O'] + ([] if res_name == 'GLY' else ['CB', 'CG', 'CD'])
+                for atm_name in atom_names:
+                    x, y, z = rng.uniform(-100, 100, 3)
+                    f.write('ATOM  %5d  %-3s %3s %s%4d    %8.3f%8.3f%8.3f%6.2f%6.2f           %s\n'
+                            % (atom_no % 100000, atm_name, res_name, chain, res_no, x, y, z, 1.0, rng.uniform(20, 98), atm_name[0]))
+                    atom_no += 1
+        f.write('END\n')
+
+
+def read_pdb_line_by_line(pdbfile):
+    """The parser used by pdockq.py and Predicted_model.read_pdb before pdb_reader.py"""
+    chain_coords, chain_plddt = {}, {}
+    with open(pdbfile, 'r') as file:
+        for line in file:
+            if not line.startswith('ATOM'):
+                continue
+            record = {'atm_name':line[12:16].strip(), 'res_name':line[17:20].strip(), 'chain':line[21],
+                      'x':float(line[30:38]), 'y':float(line[38:46]), 'z':float(line[46:54]), 'B':float(line[60:66])}
+            if record['atm_name'] == 'CB' or (record['atm_name'] == 'CA' and record['res_name'] == 'GLY'):
+                if record['chain'] in [*chain_coords.keys()]:
+                    chain_coords[record['chain']].append([record['x'], record['y'], record['z']])
+                    chain_plddt[record['chain']].append(record['B'])
+                else:
+                    chain_coords[record['chain']] = [[record['x'], record['y'], record['z']]]
+                    chain_plddt[record['chain']] = [record['B']]
+    for chain in chain_coords:
+        chain_coords[chain] = np.array(chain_coords[chain])
+        chain_plddt[chain] = np.array(chain_plddt[chain])
+    return chain_coords, chain_plddt
+
+
+def best_time(function, pdbfile, repeats):
+    """Return the fastest of repeats runs of function on pdbfile and its result"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function(pdbfile)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the NumPy PDB reader against the line by line parser.')
+    parser.add_argument('-chains', type=int, default=4, help='Number of chains of the synthetic complex, default 4')
+    parser.add_argument('-residues', type=int, default=2000, help='Number of residues per chain, default 2000')
+    parser.add_argument('-repeats', type=int, default=3, help='Number of timed runs per parser, the fastest is reported, default 3')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdbfile = os.path.join(temp_dir, 'complex.pdb')
+        write_synthetic_complex(pdbfile, args.chains, args.residues)
+        line_time, (line_coords, line_plddt) = best_time(read_pdb_line_by_line, pdbfile, args.repeats)
+        numpy_time, (numpy_coords, numpy_plddt) = best_time(read_pdb, pdbfile, args.repeats)
+
+    assert list(line_coords) == list(numpy_coords)
+    for chain in line_coords:
+        assert np.array_equal(line_coords[chain], numpy_coords[chain]) and np.array_equal(line_plddt[chain], numpy_plddt[chain])
+    print(f'{args.chains} chains x {args.residues} residues')
+    print(f'line by line parser: {line_time:.3f} s')
+    print(f'NumPy reader:        {numpy_time:.3f} s')
+    print(f'speedup:             {line_time / numpy_time:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
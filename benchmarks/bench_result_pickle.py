@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Check and benchmark the lean reader of individual/result_pickle.py against pickle.load.
+
+The lean reader relies on internals of the pure Python unpickler of CPython, so a new Python version could make it stop
+skipping arrays or fail to unpickle. A synthetic AlphaFold result pickle and features pickle are written with pickle
+protocol 4, like AlphaFold does, with 3D arrays spanning many frames, and the reader is checked to skip the large arrays,
+to return the confidences and the PAE unchanged and to return only the msa when asked for it, before the timings are reported.
+
+Usage: python bench_result_pickle.py [-residues 500] [-repeats 3]
+"""
+
+import argparse
+import os
+import pickle
+import sys
+import tempfile
+import time
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'individual'))
+from result_pickle import read_result_pickle
+
+
+def write_synthetic_pickles(temp_dir, num_residues):
+    """Write a result pickle and a features pickle shaped like the AlphaFold multimer outputs for num_residues residues"""
+    rng = np.random.default_rng(0)
+    result = {'ptm': np.array(0.61), 'iptm': np.array(0.42), 'ranking_confidence': 0.46,
+              'plddt': rng.uniform(20, 98, num_residues),
+              'predicted_aligned_error': rng.uniform(0, 31.75, (num_residues, num_residues)).astype(np.float32),
+              'max_predicted_aligned_error': np.array(31.75),
+              'aligned_confidence_probs': rng.random((num_residues, num_residues, 64), dtype=np.float32),
+              'distogram': {'logits': rng.random((num_residues, num_residues, 64), dtype=np.float32),
+                            'bin_edges': np.linspace(2.3, 21.7, 63)},
+              'structure_module': {'final_atom_positions': rng.random((num_residues, 37, 3), dtype=np.float32)}}
+    features = {'msa': rng.integers(0, 22, (300, num_residues)).astype(np.int32),
+                'deletion_matrix_int': rng.integers(0, 3, (300, num_residues)).astype(np.int32),
+                'template_all_atom_positions': rng.random((4, num_residues, 37, 3), dtype=np.float32)}
+    result_path = os.path.join(temp_dir, 'result_model_1_multimer_v3_pred_0.pkl')
+    features_path = os.path.join(temp_dir, 'features.pkl')
+    for path, content in ((result_path, result), (features_path, features)):
+        with open(path, 'wb') as f:
+            pickle.dump(content, f, protocol=4)
+    return result_path, result, features_path, features
+
+
+def check_lean_reader(result_path, result, features_path, features):
+    """Assert that the lean reader skips the large arrays and returns the others unchanged"""
+    scalars = read_result_pickle(result_path, max_ndim=1)
+    for key in ('ptm', 'iptm', 'ranking_confidence', 'max_predicted_aligned_error'):
+        assert float(scalars[key]) == float(result[key]), key
+    assert np.array_equal(scalars['plddt'], result['plddt'])
+    assert np.array_equal(scalars['distogram']['bin_edges'], result['distogram']['bin_edges'])
+    for value in (scalars['predicted_aligned_error'], scalars['aligned_confidence_probs'], scalars['distogram']['logits'], scalars['structure_module']['final_atom_positions']):
+        assert value is None
+
+    with_pae = read_result_pickle(result_path, max_ndim=2)
+    assert np.array_equal(with_pae['predicted_aligned_error'], result['predicted_aligned_error'])
+    assert float(with_pae['iptm']) == float(result['iptm']) and np.array_equal(with_pae['plddt'], result['plddt'])
+    assert with_pae['aligned_confidence_probs'] is None and with_pae['distogram']['logits'] is None
+
+    msa_only = read_result_pickle(features_path, max_ndim=2, keys=('msa',))
+    assert np.array_equal(msa_only['msa'], features['msa'])
+    assert all(value is None for key, value in msa_only.items() if key != 'msa')
+
+
+def best_time(function, repeats):
+    """Return the fastest of repeats runs of function"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check and benchmark the lean result pickle reader against pickle.load.')
+    parser.add_argument('-residues', type=int, default=500, help='Number of residues of the synthetic prediction, default 500')
+    parser.add_argument('-repeats', type=int, default=3, help='Number of timed runs per reader, the fastest is reported, default 3')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        result_path, result, features_path, features = write_synthetic_pickles(temp_dir, args.residues)
+        check_lean_reader(result_path, result, features_path, features)
+
+        def load_full():
+            with open(result_path, 'rb') as f:
+                pickle.load(f)
+        full_time = best_time(load_full, args.repeats)
+        lean_time = best_time(lambda: read_result_pickle(result_path, max_ndim=1), args.repeats)
+        pickle_size = os.path.getsize(result_path)
+
+    print(f'{args.residues} residues, result pickle of {pickle_size / 1e6:.1f} MB, lean reader checks passed')
+    print(f'pickle.load:  {full_time:.3f} s')
+    print(f'lean reader:  {lean_time:.3f} s')
+    print(f'speedup:      {full_time / lean_time:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark the startup time of the subcommands of alphascreen.py.
+
+Every subcommand is started with -h in a fresh interpreter with python -X importtime, which imports the script of the
+subcommand and exits once its arguments are parsed. The wall time, the total import time and the heaviest top level
+imports are reported, and the run fails if the metrics subcommand takes longer than -max_seconds to start.
+
+Usage: python startup_time.py [-subcommands metrics pdockq] [-repeats 3] [-max_seconds 1]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+CLI = os.path.join(ROOT, 'alphascreen.py')
+
+
+def parse_importtime(stderr):
+    """Sum up the -X importtime report of an interpreter
+
+    Args:
+        stderr (str): standard error of the interpreter
+
+    Returns:
+        total (float): total import time in seconds
+        top_level (list): cumulative import time in seconds and name of every top level import, slowest first
+    """
+    total = 0
+    top_level = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        total += int(self_us)
+        # nested imports are indented below the import that triggered them
+        if not name[1:].startswith(' '):
+            top_level.append((int(cumulative_us) / 1e6, name.strip()))
+    return total / 1e6, sorted(top_level, reverse=True)
+
+
+def time_startup(subcommand):
+    """Start a subcommand with -h in a fresh interpreter
+
+    Returns:
+        wall_time (float): time until the interpreter exited in seconds
+        total (float), top_level (list): see parse_importtime
+    """
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', CLI, subcommand, '-h'], capture_output=True, text=True)
+    wall_time = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f'{subcommand} failed to start:\n{result.stderr[-2000:]}')
+    return (wall_time,) + parse_importtime(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the startup time of the alphascreen.py subcommands.')
+    parser.add_argument('-subcommands', nargs='+', default=['metrics', 'features', 'pdockq', 'plots', 'chimerax-contacts'], help='Subcommands to start')
+    parser.add_argument('-repeats', type=int, default=3, help='Number of starts per subcommand, the fastest is reported')
+    parser.add_argument('-top', type=int, default=5, help='Number of heaviest top level imports reported')
+    parser.add_argument('-max_seconds', type=float, default=1.0, help='Largest accepted startup time of the metrics subcommand in seconds')
+    args = parser.parse_args()
+
+    results = {}
+    for subcommand in args.subcommands:
+        wall_time, total, top_level = min((time_startup(subcommand) for _ in range(args.repeats)), key=lambda result: result[0])
+        results[subcommand] = wall_time
+        print(f'{subcommand}: {wall_time:.3f} s to start, {total:.3f} s of imports')
+        for cumulative, name in top_level[:args.top]:
+            print(f'    {cumulative:.3f} s  {name}')
+
+    if results.get('metrics', 0) > args.max_seconds:
+        print(f"metrics took {results['metrics']:.3f} s to start, more than {args.max_seconds} s")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
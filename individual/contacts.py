@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Find the pairs of points within a distance threshold with a cell list.
+
+The points are binned into cubic cells with the threshold as edge length, so that every pair within the threshold
+lies in the same or in neighbouring cells. Only the pairs of points in the 27 neighbouring cells are measured, which
+keeps time and memory close to linear in the number of points instead of building the full N x M distance matrix.
+"""
+
+import itertools
+import numpy as np
+
+NEIGHBOUR_OFFSETS = np.array(list(itertools.product((-1, 0, 1), repeat=3)))
+
+
+def _cell_keys(cells, dims):
+    """Flatten the integer cell coordinates into one key per cell"""
+    return (cells[:, 0] * dims[1] + cells[:, 1]) * dims[2] + cells[:, 2]
+
+
+def find_contacts(coords_a, coords_b, threshold):
+    """Find all pairs of points of coords_a and coords_b within the threshold
+
+    Args:
+        coords_a (np.array): n x 3 coordinates
+        coords_b (np.array): m x 3 coordinates
+        threshold (float): distance threshold, pairs at exactly the threshold are included
+
+    Returns:
+        contacts (np.array): k x 2 indices into coords_a and coords_b, sorted like np.argwhere(distances <= threshold)
+        distances (np.array): distance of every pair of contacts
+    """
+    coords_a = np.asarray(coords_a, dtype=float).reshape(-1, 3)
+    coords_b = np.asarray(coords_b, dtype=float).reshape(-1, 3)
+    if len(coords_a) == 0 or len(coords_b) == 0:
+        return np.empty((0, 2), dtype=np.int64), np.empty(0)
+    origin = np.minimum(coords_a.min(axis=0), coords_b.min(axis=0))
+    # shift the cells by one so that the neighbours of every cell have non-negative coordinates
+    cells_a = np.floor((coords_a - origin) / threshold).astype(np.int64) + 1
+    cells_b = np.floor((coords_b - origin) / threshold).astype(np.int64) + 1
+    dims = np.maximum(cells_a.max(axis=0), cells_b.max(axis=0)) + 2
+    keys_b = _cell_keys(cells_b, dims)
+    order_b = np.argsort(keys_b, kind='stable')
+    sorted_keys_b = keys_b[order_b]
+
+    index_a, index_b, distances = [], [], []
+    for offset in NEIGHBOUR_OFFSETS:
+        neighbour_keys = _cell_keys(cells_a + offset, dims)
+        start = np.searchsorted(sorted_keys_b, neighbour_keys, side='left')
+        counts = np.searchsorted(sorted_keys_b, neighbour_keys, side='right') - start
+        total = counts.sum()
+        if total == 0:
+            continue
+        # expand every point of coords_a into one candidate pair per point of coords_b in the neighbouring cell
+        candidate_a = np.repeat(np.arange(len(coords_a)), counts)
+        position = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        candidate_b = order_b[np.repeat(start, counts) + position]
+        candidate_distances = np.sqrt(np.sum((coords_a[candidate_a] - coords_b[candidate_b]) ** 2, axis=1))
+        within = candidate_distances <= threshold
+        index_a.append(candidate_a[within])
+        index_b.append(candidate_b[within])
+        distances.append(candidate_distances[within])
+
+    if not index_a:
+        return np.empty((0, 2), dtype=np.int64), np.empty(0)
+    index_a, index_b, distances = np.concatenate(index_a), np.concatenate(index_b), np.concatenate(distances)
+    order = np.lexsort((index_b, index_a))
+    return np.stack([index_a[order], index_b[order]], axis=1), distances[order]
+
+
+def find_interchain_contacts(coords, chain_index, threshold):
+    """Find all pairs of points of different chains within the threshold, for any number of chains in one pass
+
+    Args:
+        coords (np.array): n x 3 coordinates of all chains
+        chain_index (np.array): index of the chain of every point
+        threshold (float): distance threshold, pairs at exactly the threshold are included
+
+    Returns:
+        contacts (np.array): k x 2 indices into coords with the first index smaller than the second
+        distances (np.array): distance of every pair of contacts
+    """
+    chain_index = np.asarray(chain_index)
+    contacts, distances = find_contacts(coords, coords, threshold)
+    interchain = (contacts[:, 0] < contacts[:, 1]) & (chain_index[contacts[:, 0]] != chain_index[contacts[:, 1]])
+    return contacts[interchain], distances[interchain]
+
+
+def find_residue_contacts(coords_a, residues_a, coords_b, residues_b, threshold):
+    """Find all pairs of residues with any atoms of coords_a and coords_b within the threshold
+
+    Args:
+        coords_a (np.array): n x 3 atom coordinates
+        residues_a (np.array): index of the residue of every atom of coords_a
+        coords_b (np.array): m x 3 atom coordinates
+        residues_b (np.array): index of the residue of every atom of coords_b
+        threshold (float): distance threshold, pairs at exactly the threshold are included
+
+    Returns:
+        residue_pairs (np.array): k x 2 residue indices of residues_a and residues_b in contact, sorted by the first and then the second residue
+        distances (np.array): shortest distance between the atoms of every pair of residues
+    """
+    residues_a, residues_b = np.asarray(residues_a), np.asarray(residues_b)
+    contacts, distances = find_contacts(coords_a, coords_b, threshold)
+    if len(contacts) == 0:
+        return np.empty((0, 2), dtype=np.int64), np.empty(0)
+    residue_a, residue_b = residues_a[contacts[:, 0]], residues_b[contacts[:, 1]]
+    # sort the atom pairs by residue pair and distance, the first atom pair of every residue pair is its shortest
+    order = np.lexsort((distances, residue_b, residue_a))
+    residue_a, residue_b, distances = residue_a[order], residue_b[order], distances[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = (residue_a[1:] != residue_a[:-1]) | (residue_b[1:] != residue_b[:-1])
+    return np.stack([residue_a[first], residue_b[first]], axis=1), distances[first]
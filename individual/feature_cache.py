@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Extract the features used by the metrics and plotting scripts from the AlphaFold result pickles once, and store them
+in a compact cache in every prediction folder.
+
+The cache, features_cache.npz, holds for every model of the prediction the PAE quantized to uint8 (steps of 0.125,
+AlphaFold caps the PAE at 31.75), the plddt as float16 and the ptm, iptm and ranking confidence. It is written
+uncompressed, so a single array can be read from it without reading the rest, and it records the modification time
+and size of the pickles it was extracted from so that a stale cache is detected and extracted again. The quantized PAE
+is only meant for plotting, the metrics take the scalars from the cache and the PAE from the pickles.
+
+Usage: python feature_cache.py -path_to_run <folder with prediction folders> [-workers N]
+"""
+
+import argparse
+import json
+import os
+from multiprocessing import Pool
+import numpy as np
+from result_pickle import read_result_pickle
+
+CACHE_NAME = 'features_cache.npz'
+# the PAE is stored in steps of 1/PAE_SCALE Angstrom
+PAE_SCALE = 8
+SCALAR_KEYS = ('ptm', 'iptm', 'ranking_confidence')
+
+
+def list_result_pickles(prediction_folder):
+    """List the result pickles of the models in a prediction folder
+
+    Args:
+        prediction_folder (str): path to the prediction folder
+
+    Returns:
+        pickle_names (list): sorted file names of the result_*_multimer*.pkl pickles
+    """
+    return sorted(name for name in os.listdir(prediction_folder) if name.startswith('result_') and '_multimer' in name and name.endswith('.pkl'))
+
+
+def fingerprint_result_pickles(prediction_folder):
+    """Summarize the result pickles of a prediction folder by their modification time and size
+
+    Args:
+        prediction_folder (str): path to the prediction folder
+
+    Returns:
+        fingerprint (str): json string that changes whenever one of the pickles changes
+    """
+    inputs = []
+    for name in list_result_pickles(prediction_folder):
+        stat = os.stat(os.path.join(prediction_folder, name))
+        inputs.append([name, stat.st_mtime_ns, stat.st_size])
+    return json.dumps(inputs)
+
+
+def extract_feature_cache(prediction_folder):
+    """Read every result pickle of a prediction folder once and write the features_cache.npz of the folder
+
+    Args:
+        prediction_folder (str): path to the prediction folder
+
+    Returns:
+        cache_path (str): path to the written cache, None if the folder has no result pickles
+    """
+    pickle_names = list_result_pickles(prediction_folder)
+    if not pickle_names:
+        return None
+    fingerprint = fingerprint_result_pickles(prediction_folder)
+    arrays = {}
+    model_names = []
+    for pickle_name in pickle_names:
+        model_name = pickle_name.replace('result_', '').replace('.pkl', '')
+        # arrays with more than two dimensions, the distogram and aligned confidence probabilities, are never read
+        pickle_data = read_result_pickle(os.path.join(prediction_folder, pickle_name), max_ndim=2)
+        if pickle_data.get('predicted_aligned_error') is not None:
+            pae = np.clip(np.asarray(pickle_data['predicted_aligned_error'], dtype=np.float32), 0, 255 / PAE_SCALE)
+            arrays[f'{model_name}.pae'] = np.round(pae * PAE_SCALE).astype(np.uint8)
+        if pickle_data.get('plddt') is not None:
+            arrays[f'{model_name}.plddt'] = np.asarray(pickle_data['plddt'], dtype=np.float16)
+        arrays[f'{model_name}.scalars'] = np.array([np.nan if pickle_data.get(key) is None else float(pickle_data[key]) for key in SCALAR_KEYS])
+        model_names.append(model_name)
+    arrays['models'] = np.array(model_names)
+    arrays['fingerprint'] = np.array(fingerprint)
+    cache_path = os.path.join(prediction_folder, CACHE_NAME)
+    # write next to the cache and rename, so that readers never see a partially written cache
+    temp_path = os.path.join(prediction_folder, f'tmp_{os.getpid()}_{CACHE_NAME}')
+    np.savez(temp_path, **arrays)
+    os.replace(temp_path, cache_path)
+    return cache_path
+
+
+def open_feature_cache(prediction_folder):
+    """Open the features_cache.npz of a prediction folder if it is up to date with the result pickles
+
+    Args:
+        prediction_folder (str): path to the prediction folder
+
+    Returns:
+        cache (NpzFile): the opened cache, arrays are read when accessed, None if the cache is missing or stale
+    """
+    cache_path = os.path.join(prediction_folder, CACHE_NAME)
+    if not os.path.exists(cache_path):
+        return None
+    cache = np.load(cache_path)
+    if str(cache['fingerprint']) != fingerprint_result_pickles(prediction_folder):
+        cache.close()
+        return None
+    return cache
+
+
+def read_cached_model(cache, model_name, with_pae=True):
+    """Read the features of one model from an opened cache, with the keys used in the result pickles
+
+    Args:
+        cache (NpzFile): cache opened with open_feature_cache
+        model_name (str): name of the model like model_1_multimer_v3_pred_0
+        with_pae (bool): also read and dequantize the PAE
+
+    Returns:
+        features (dict): predicted_aligned_error, plddt, ptm, iptm and ranking_confidence, None if the model is not in the cache
+    """
+    if f'{model_name}.scalars' not in cache.files:
+        return None
+    features = dict(zip(SCALAR_KEYS, (None if np.isnan(value) else value for value in cache[f'{model_name}.scalars'])))
+    features['plddt'] = cache[f'{model_name}.plddt'].astype(np.float32) if f'{model_name}.plddt' in cache.files else None
+    features['predicted_aligned_error'] = None
+    if with_pae and f'{model_name}.pae' in cache.files:
+        features['predicted_aligned_error'] = cache[f'{model_name}.pae'].astype(np.float32) / PAE_SCALE
+    return features
+
+
+def load_feature_cache(prediction_folder, with_pae=True, extract=True):
+    """Load the features of every model of a prediction folder from its cache, extracting the cache first if it is missing or stale
+
+    Args:
+        prediction_folder (str): path to the prediction folder
+        with_pae (bool): also read and dequantize the PAE
+        extract (bool): extract the cache if it is missing or stale, otherwise return None in that case
+
+    Returns:
+        model_features (dict): model name as key and the features of the model, see read_cached_model, as value
+    """
+    cache = open_feature_cache(prediction_folder)
+    if cache is None:
+        if not extract or extract_feature_cache(prediction_folder) is None:
+            return None
+        cache = open_feature_cache(prediction_folder)
+    with cache:
+        return {str(model_name):read_cached_model(cache, str(model_name), with_pae=with_pae) for model_name in cache['models']}
+
+
+def read_model_features(prediction_folder, model_name, with_pae=True):
+    """Read the features of one model for the metrics, the scalars from the cache of its prediction folder if it is up to date, and the PAE from its result pickle
+    The PAE of the cache is quantized for plotting, so the metrics always read the exact PAE from the pickle, as they would without a cache
+
+    Args:
+        prediction_folder (str): path to the prediction folder
+        model_name (str): name of the model like model_1_multimer_v3_pred_0
+        with_pae (bool): also read the PAE
+
+    Returns:
+        features (dict): predicted_aligned_error, plddt, ptm, iptm and ranking_confidence
+    """
+    pickle_path = os.path.join(prediction_folder, f'result_{model_name}.pkl')
+    if with_pae:
+        return read_result_pickle(pickle_path, max_ndim=2)
+    cache = open_feature_cache(prediction_folder)
+    if cache is not None:
+        with cache:
+            features = read_cached_model(cache, model_name, with_pae=False)
+        if features is not None:
+            return features
+    return read_result_pickle(pickle_path, max_ndim=1)
+
+
+def extract_if_stale(prediction_folder):
+    """Extract the cache of a prediction folder unless it is up to date, meant to be run inside a worker process
+
+    Returns:
+        prediction_folder (str): path to the prediction folder
+        status (str): extracted, up to date or no pickles
+    """
+    cache = open_feature_cache(prediction_folder)
+    if cache is not None:
+        cache.close()
+        return prediction_folder, 'up to date'
+    if extract_feature_cache(prediction_folder) is None:
+        return prediction_folder, 'no pickles'
+    return prediction_folder, 'extracted'
+
+
+def main():
+    """Extract the feature cache of every prediction folder of a run
+    """
+    parser = argparse.ArgumentParser(description='Extract the features of the AlphaFold result pickles into a features_cache.npz per prediction folder.')
+    parser.add_argument('-path_to_run', type=str, required=True, help='Path to the folder containing the prediction folders', dest='path_to_run')
+    parser.add_argument('-workers', '--workers', type=int, default=1, help='Number of worker processes, default 1', dest='workers')
+    args = parser.parse_args()
+
+    prediction_folders = sorted(os.path.join(args.path_to_run, name) for name in os.listdir(args.path_to_run) if os.path.isdir(os.path.join(args.path_to_run, name)))
+    with Pool(processes=max(1, args.workers)) as pool:
+        for prediction_folder, status in pool.imap(extract_if_stale, prediction_folders):
+            print(f'{prediction_folder}: {status}')
+
+
+if __name__ == '__main__':
+    main()
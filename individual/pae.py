@@ -1,227 +1,480 @@
-import matplotlib.pyplot as plt
-import seaborn as sns
-sns.set_theme()
-import pickle
-from Bio import SeqIO
-from itertools import accumulate
-import json
+import argparse
+import os
 import glob
-import numpy as np
-import pandas as pd
-import subprocess
-import re
-
-# fasta file with input sequence must be in result directory
-input_sequence_name = glob.glob('*fasta')[0]
-
-# plot title as in fasta file
-try:
-    protein_names_for_title = input_sequence_name.replace('.fasta', '')
-except:
-    protein_names_for_title = ''
-
-try:
-    input_sequence = SeqIO.to_dict(SeqIO.parse(input_sequence_name, 'fasta'))
-    # handle homomultimers with identical fasta headers
-except ValueError:
-    with open(input_sequence_name) as original, open('corrected.fasta', 'w') as corrected:
-        records = SeqIO.parse(original, 'fasta')
-        for idx, record in enumerate(records):
-            record.id = record.id + str(idx)
-            print(record.id)
-            SeqIO.write(record, corrected, 'fasta')
-    corrected.close()
-    input_sequence = SeqIO.to_dict(SeqIO.parse('corrected.fasta', 'fasta'))
-
-# pickle files coming out of AF run
-file_list = glob.glob('*_multimer*.pkl')
-file_list = sorted(file_list)
-
-# finished run will produce a .json file with the model ranking
-try:
-    json1_file = open('ranking_debug.json')
-    json1_str = json1_file.read()
-    model_stats = json.loads(json1_str)
-    json1_file.close()
-    model_ranking = model_stats.get('order')
-except FileNotFoundError:  # plot an incomplete run
-    model_ranking = []
-
-width_list = []
-
-list_ranking = {}
-
-statistics_list = []
-
-# read pkl, match model number with rank using json file
-for index, file_name in enumerate(file_list):
-    d = pickle.load(open(file_name, 'rb'))
-    model_name = file_name.replace('.pkl', '')
-    model_name = model_name.replace('result_', '')
+import json
+from itertools import accumulate
+from multiprocessing import Pool
+# matplotlib, seaborn, Bio, numpy and pandas are imported by the functions using them, so that importing this module stays fast
+
+
+# largest number of pixels along each side of a PAE panel, longer complexes are block-reduced to it
+PAE_MAX_PIXELS = 1000
+# records the inputs and options the plots of a prediction folder were made with
+MANIFEST_NAME = 'plots_manifest.json'
+PLOT_OUTPUTS = ('model_statistics.csv', 'predicted_alignment_error.png', 'pLDDT.png')
+# bounds of the MSA coverage image, and the gap token of the AlphaFold MSA encoding
+MSA_MAX_ROWS = 1000
+MSA_MAX_COLUMNS = 2000
+MSA_GAP = 21
+
+
+def import_pyplot():
+    '''Import pyplot with the non-interactive Agg backend, the figures are only saved to files
+    '''
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def find_input_fasta(prediction_folder):
+    '''Find the fasta file with the input sequence, <prediction folder>.fasta next to the prediction folder like in a run folder,
+    or else in the prediction folder, never the corrected.fasta earlier versions wrote there for homomultimers
+    '''
+    prediction_folder = os.path.normpath(os.path.abspath(prediction_folder))
+    prediction_name = os.path.basename(prediction_folder)
+    for fasta_path in (f'{prediction_folder}.fasta', os.path.join(prediction_folder, f'{prediction_name}.fasta')):
+        if os.path.exists(fasta_path):
+            return fasta_path
+    fasta_files = sorted(fasta_path for fasta_path in glob.glob(os.path.join(prediction_folder, '*fasta')) if os.path.basename(fasta_path) != 'corrected.fasta')
+    if fasta_files:
+        return fasta_files[0]
+    return f'{prediction_folder}.fasta'
+
+
+def fingerprint_plot_inputs(prediction_folder):
+    '''Summarize the inputs of the plots and model_statistics.csv of a prediction folder by their modification time and size
+    The inputs are the result pickles, features.pkl, ranking_debug.json, the models scored with pDockQ and the input fasta file, see find_input_fasta
+    '''
+    inputs = []
+    for entry in os.scandir(prediction_folder):
+        if entry.name in ('ranking_debug.json', 'features.pkl') or (entry.name.startswith('result_') and entry.name.endswith('.pkl')) or (entry.name.endswith('.pdb') and '_model_' in entry.name):
+            stat = entry.stat()
+            inputs.append([entry.name, stat.st_mtime_ns, stat.st_size])
+    fasta_path = find_input_fasta(prediction_folder)
+    if os.path.exists(fasta_path):
+        stat = os.stat(fasta_path)
+        inputs.append([os.path.basename(fasta_path), stat.st_mtime_ns, stat.st_size])
+    return sorted(inputs)
+
+
+def read_manifest(prediction_folder):
+    '''Read the plots_manifest.json of a prediction folder, None if it is missing or unreadable
+    '''
     try:
-        model_rank = model_ranking.index(model_name)
-    except ValueError:
-        model_rank = index
-    list_ranking[file_name] = [d, model_rank]
-    width_list.append(4)
-    statistics_list.append([model_name,
-                            d.get('ptm'),
-                            d.get('iptm'),
-                            np.mean(d.get('plddt')),
-                            d.get('ranking_confidence')])
-
-width_list.append(0.2)
-
-# check protein lengths in input files for PAE plot
-sequence_lengths = []
-
-for item in input_sequence.keys():
-    sequence = input_sequence.get(item)
-    sequence_length = len(sequence.seq)
-    sequence_lengths.append(sequence_length)
-
+        with open(os.path.join(prediction_folder, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
 
-# figure out positions for black lines delimiting proteins in PAE plot
-line_position_accumulated = accumulate(sequence_lengths)
-line_positions = []
-for item in line_position_accumulated:
-    line_positions.append(item)
 
+def write_manifest(prediction_folder, manifest):
+    '''Write the plots_manifest.json of a prediction folder, next to it first and renamed so that it is never partially written
+    '''
+    manifest_path = os.path.join(prediction_folder, MANIFEST_NAME)
+    temp_path = os.path.join(prediction_folder, f'tmp_{os.getpid()}_{MANIFEST_NAME}')
+    with open(temp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(temp_path, manifest_path)
 
-# write stats file--------
-model_stats = pd.DataFrame(statistics_list,
-                           columns=['model', 'ptm', 'iptm', 'plddt', 'confrank'])
-model_stats.to_csv('model_statistics.csv', index=False)
 
+def plots_up_to_date(prediction_folder, manifest):
+    '''Check whether the plots of a prediction folder were made from its current inputs with the same options and are all still there
+    '''
+    if read_manifest(prediction_folder) != manifest:
+        return False
+    outputs = PLOT_OUTPUTS + (('MSA.png',) if os.path.exists(os.path.join(prediction_folder, 'features.pkl')) else ())
+    return all(os.path.exists(os.path.join(prediction_folder, output)) for output in outputs)
 
-# Run pdockq.py command and capture the output
-pdockq_cmd = "python pdockq.py"
-output = subprocess.check_output(pdockq_cmd, shell=True, universal_newlines=True)
 
-import pandas as pd
+def read_input_sequences(prediction_folder):
+    '''Read the fasta file with the input sequence, see find_input_fasta
+    Returns the protein names for the plot titles and the length of every sequence
+    '''
+    from Bio import SeqIO
 
-# Read the model_statistics.csv file
-statistics_data = pd.read_csv('model_statistics.csv')
+    input_sequence_name = find_input_fasta(prediction_folder)
 
-# Read the pdockq.csv file
-pdockq_data = pd.read_csv('pdockq.csv')
+    # plot title as in fasta file
+    try:
+        protein_names_for_title = os.path.basename(input_sequence_name).replace('.fasta', '')
+    except:
+        protein_names_for_title = ''
 
-# Extract the model names from the pdb_file column in pdockq_data
-pdockq_data['model'] = pdockq_data['pdb_file'].str.replace('unrelaxed_', '').str.replace('.pdb', '')
+    # every record is kept, also the chains of homomultimers with identical fasta headers
+    sequence_lengths = [len(record.seq) for record in SeqIO.parse(input_sequence_name, 'fasta')]
+    return protein_names_for_title, sequence_lengths
 
-# Merge the two DataFrames based on the model name
-merged_data = pd.merge(statistics_data, pdockq_data, on='model', how='outer')
 
-# Select the required columns
-columns = ['model', 'ptm', 'iptm', 'plddt', 'confrank', 'pdockq', 'ppv']
+def read_model_ranking(prediction_folder):
+    '''Read the model ranking of a finished run from ranking_debug.json, an incomplete run has an empty ranking
+    '''
+    try:
+        with open(os.path.join(prediction_folder, 'ranking_debug.json')) as json1_file:
+            model_stats = json.load(json1_file)
+        return model_stats.get('order')
+    except FileNotFoundError:  # plot an incomplete run
+        return []
+
+
+def rank_models(model_features, model_ranking):
+    '''Match the model number with its rank using the ranking of the json file
+    Returns the sorted pickle file names, the features and rank of every pickle file and the statistics of every model
+    '''
+    import numpy as np
+
+    file_list = sorted(f'result_{model_name}.pkl' for model_name in model_features)
+    list_ranking = {}
+    statistics_list = []
+    for index, file_name in enumerate(file_list):
+        model_name = file_name.replace('.pkl', '')
+        model_name = model_name.replace('result_', '')
+        d = model_features[model_name]
+        try:
+            model_rank = model_ranking.index(model_name)
+        except ValueError:
+            model_rank = index
+        list_ranking[file_name] = [d, model_rank]
+        statistics_list.append([model_name,
+                                d.get('ptm'),
+                                d.get('iptm'),
+                                np.mean(d.get('plddt')),
+                                d.get('ranking_confidence')])
+    return file_list, list_ranking, statistics_list
+
+
+def write_model_statistics(prediction_folder, statistics_list):
+    '''Write the statistics of every model together with its pDockQ to model_statistics.csv
+    '''
+    import pandas as pd
+    from pdockq import score_folder
+
+    statistics_path = os.path.join(prediction_folder, 'model_statistics.csv')
+    # write stats file--------
+    model_stats = pd.DataFrame(statistics_list,
+                               columns=['model', 'ptm', 'iptm', 'plddt', 'confrank'])
+    model_stats.to_csv(statistics_path, index=False)
+
+    # Score the models with pDockQ in this process, the scores are also saved to pdockq.csv
+    pdockq_data = score_folder(prediction_folder)
+
+    # Read the model_statistics.csv file
+    statistics_data = pd.read_csv(statistics_path)
+
+    # Extract the model names from the pdb_file column in pdockq_data
+    pdockq_data['model'] = pdockq_data['pdb_file'].str.replace('unrelaxed_', '').str.replace('.pdb', '')
+
+    # Merge the two DataFrames based on the model name
+    merged_data = pd.merge(statistics_data, pdockq_data, on='model', how='outer')
+
+    # Select the required columns
+    columns = ['model', 'ptm', 'iptm', 'plddt', 'confrank', 'pdockq', 'ppv']
+
+    # Extract the combined scores from the merged_data DataFrame
+    combined_scores = merged_data[columns]
+
+    # Save the combined scores to a new file named updated_model_statistics.csv
+    combined_scores.to_csv(statistics_path, index=False)
+
+
+def block_reduce(matrix, max_pixels, reduction='mean'):
+    '''Pool a square matrix in square blocks of residues so that it has at most max_pixels rows and columns
+    The last block of a side that does not divide evenly is pooled over the residues it has
+    Returns the pooled matrix and the number of residues per block, the matrix itself if it is small enough
+    '''
+    import numpy as np
+
+    length = len(matrix)
+    block_size = -(-length // max_pixels) if max_pixels else 1
+    if block_size <= 1:
+        return matrix, 1
+    num_blocks = -(-length // block_size)
+    padded = np.full((num_blocks * block_size, num_blocks * block_size), np.nan, dtype=np.float32)
+    padded[:length, :length] = matrix
+    blocks = padded.reshape(num_blocks, block_size, num_blocks, block_size)
+    if reduction == 'min':
+        return np.nanmin(blocks, axis=(1, 3)), block_size
+    return np.nanmean(blocks, axis=(1, 3)), block_size
+
+
+def plot_pae(prediction_folder, file_list, list_ranking, line_positions, protein_names_for_title, max_pixels=PAE_MAX_PIXELS, reduction='mean'):
+    '''PAE plot of every model ranked from left to right, saved as predicted_alignment_error.png
+    The PAE is drawn as a single image per model, with the extent putting residue i between i and i+1 like a heatmap.
+    PAE matrices longer than max_pixels are block-reduced with the mean or min before drawing, the extent keeps the
+    image in residue units so the ticks and the lines delimiting the proteins stay in place
+    '''
+    plt = import_pyplot()
+    import seaborn as sns
+    sns.set_theme()
+
+    output_name = os.path.join(prediction_folder, 'predicted_alignment_error.png')
+
+    palette = sns.diverging_palette(220, 20, as_cmap=True)
+
+    width_list = [4] * len(file_list) + [0.2]
+    fig, axs = plt.subplots(ncols=len(file_list) + 1,
+                            gridspec_kw=dict(width_ratios=width_list),
+                            figsize=(4 * len(file_list), 4))
+    fig.subplots_adjust(top=0.8)
+
+    for file_name in file_list:
+        plot_number = list_ranking.get(file_name)[1]
+        PAE = list_ranking.get(file_name)[0]['predicted_aligned_error']
+        ipTM = list_ranking.get(file_name)[0]['iptm'].round(3)
+        tick_range = [1] + list(range(100, len(PAE), 100))
+        pooled_PAE, block_size = block_reduce(PAE, max_pixels, reduction)
+        pooled_length = len(pooled_PAE) * block_size
+        axs[plot_number].imshow(pooled_PAE,
+                                cmap=palette,
+                                vmin=0,
+                                vmax=30,
+                                extent=(0, pooled_length, pooled_length, 0),
+                                aspect='auto',
+                                interpolation='nearest')
+        axs[plot_number].grid(False)
+        # the last block can reach past the last residue, only the residues are shown
+        axs[plot_number].set_xlim(0, len(PAE))
+        axs[plot_number].set_ylim(len(PAE), 0)
+        if plot_number == 0:
+            axs[plot_number].set_yticks(ticks=tick_range, labels=tick_range)
+        else:
+            axs[plot_number].set_yticks([], [])
+        axs[plot_number].set_xticks(ticks=tick_range, labels=tick_range)
+        axs[plot_number].title.set_text(str('model' +
+                                            str(list_ranking.get(file_name)[1]) +
+                                            '\n iptm: ' +
+                                            str(ipTM)))
 
-# Extract the combined scores from the merged_data DataFrame
-combined_scores = merged_data[columns]
+        # add black lines delimiting the two proteins
+        for element in line_positions:
+            axs[plot_number].vlines(element,
+                                    ymin=0,
+                                    ymax=len(PAE),
+                                    color='black',
+                                    linewidth=3)
+            axs[plot_number].hlines(element,
+                                    xmin=0,
+                                    xmax=len(PAE),
+                                    color='black',
+                                    linewidth=3)
+
+    fig.colorbar(axs[0].images[0], cax=axs[-1])
+    fig.suptitle('Predicted alignment error ' + protein_names_for_title)
+    plt.savefig(output_name)
+    plt.close(fig)
+
+
+def plot_plddt(prediction_folder, file_list, list_ranking, line_positions, protein_names_for_title):
+    '''pLDDT plot of every model ranked from left to right, saved as pLDDT.png
+    '''
+    plt = import_pyplot()
+
+    output_name = os.path.join(prediction_folder, 'pLDDT.png')
+
+    fig, axs = plt.subplots(ncols=len(file_list),
+                            figsize=(6 * len(file_list), 6))
+
+    for file_name in file_list:
+        plot_number = list_ranking.get(file_name)[1]
+        PAE = list_ranking.get(file_name)[0]['plddt']
+        tick_range = [1] + list(range(500, len(PAE), 500))
+        ytick_range = list(range(0, 100, 10))
+        try:
+            axs[plot_number].plot(list(range(0, len(PAE), 1)), PAE, color='b')
+            axs[plot_number].set_yticks(ticks=ytick_range, labels=ytick_range)
+            axs[plot_number].set_xticks(ticks=tick_range, labels=tick_range)
+            axs[plot_number].title.set_text(str('model' + str(list_ranking.get(file_name)[1])))
+            for element in line_positions:
+                axs[plot_number].vlines(element, ymin=0, ymax=100, color='black')
+        except TypeError:  # handle single model and single pkl file
+            axs.plot(list(range(0, len(PAE), 1)), PAE, color='b')
+            axs.set_yticks(ticks=ytick_range, labels=ytick_range)
+            axs.set_xticks(ticks=tick_range, labels=tick_range)
+            axs.title.set_text(str('model' + str(list_ranking.get(file_name)[1])))
+            for element in line_positions:
+                axs.vlines(element, ymin=0, ymax=100, color='black')
+
+    fig.colorbar(axs[0].collections[0], cax=axs[-1])
+    fig.suptitle('plddt ' + protein_names_for_title)
+    plt.savefig(output_name)
+    plt.close(fig)
+
+
+def msa_coverage(msa, max_rows=MSA_MAX_ROWS, max_columns=MSA_MAX_COLUMNS):
+    '''Summarize an MSA, with the query as first sequence, into a coverage image of bounded size
+    Every aligned residue of a sequence is colored by the identity of the sequence to the query and gaps are left empty.
+    The sequences are sorted by identity, at most max_rows of them spread evenly over that order are kept, and columns
+    beyond max_columns are averaged in blocks
+    Returns the image, the number of residues per image column and the depth, the number of aligned sequences, of every column
+    '''
+    import warnings
+    import numpy as np
+
+    aligned = msa != MSA_GAP
+    identity = (msa == msa[0]).mean(axis=1)
+    depth = aligned.sum(axis=0)
+    order = np.argsort(identity, kind='stable')
+    if len(order) > max_rows:
+        order = order[np.linspace(0, len(order) - 1, max_rows).round().astype(int)]
+    image = np.where(aligned[order], identity[order, None], np.nan).astype(np.float32)
+
+    length = msa.shape[1]
+    block_size = -(-length // max_columns)
+    if block_size > 1:
+        num_blocks = -(-length // block_size)
+        padded = np.full((len(image), num_blocks * block_size), np.nan, dtype=np.float32)
+        padded[:, :length] = image
+        # blocks of gaps only stay empty
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            image = np.nanmean(padded.reshape(len(image), num_blocks, block_size), axis=2)
+    return image, block_size, depth
+
+
+def plot_msa(prediction_folder, line_positions):
+    '''MSA coverage plot from features.pkl, saved as MSA.png, skipped if the prediction folder has no features.pkl
+    Only the msa is read from features.pkl, and the image is bounded by MSA_MAX_ROWS and MSA_MAX_COLUMNS whatever the size of the MSA
+    '''
+    features_path = os.path.join(prediction_folder, 'features.pkl')
+    if not os.path.exists(features_path):
+        return
+    import numpy as np
+    from result_pickle import read_result_pickle
+    plt = import_pyplot()
+    import seaborn as sns
+    sns.set_theme()
+
+    msa = read_result_pickle(features_path, max_ndim=2, keys=('msa',))['msa']
+    num_sequences, length = msa.shape
+    image, block_size, depth = msa_coverage(msa)
+    tick_range = [1] + list(range(500, length, 500))
+
+    fig, ax = plt.subplots(figsize=(8, 5))
+    # the sequences are drawn from the bottom with the highest identity on top, in units of sequences of the full MSA
+    coverage = ax.imshow(image,
+                         cmap='rainbow_r',
+                         vmin=0,
+                         vmax=1,
+                         extent=(0, image.shape[1] * block_size, 0, num_sequences),
+                         origin='lower',
+                         aspect='auto',
+                         interpolation='nearest')
+    ax.plot(np.arange(length) + 0.5, depth, color='black')
+    ax.set_xlim(0, length)
+    ax.set_ylim(0, num_sequences)
+    ax.grid(False)
+    fig.colorbar(coverage, ax=ax, label='Sequence identity to query')
+    ax.set_xticks(ticks=tick_range, labels=tick_range)
+    ax.set_xlabel("residue")
+    ax.set_ylabel("sequences")
+    ax.set_title("Sequence coverage")
+    for line_position in line_positions:
+        ax.vlines(line_position,
+                  ymin=0,
+                  ymax=num_sequences,
+                  color="black",
+                  linewidth=3)
+    fig.subplots_adjust(bottom=0.15)
+    fig.savefig(os.path.join(prediction_folder, "MSA.png"))
+    plt.close(fig)
 
-# Save the combined scores to a new file named updated_model_statistics.csv
-combined_scores.to_csv('model_statistics.csv', index=False)
 
+def plot_prediction_folder(prediction_folder='.', pae_max_pixels=PAE_MAX_PIXELS, pae_reduction='mean', force=False):
+    '''Write model_statistics.csv and the PAE, pLDDT and MSA plots of a prediction folder
+    The PAE is block-reduced to at most pae_max_pixels per side with the pae_reduction, mean or min, 0 draws it at full resolution.
+    The folder is skipped if plots_manifest.json shows that its plots were made from the current inputs with the same options, unless force is set
+    Returns plotted, up to date or no pickles
+    '''
+    from feature_cache import load_feature_cache
 
+    manifest = {'inputs':fingerprint_plot_inputs(prediction_folder), 'options':{'pae_max_pixels':pae_max_pixels, 'pae_reduction':pae_reduction}}
+    if not force and plots_up_to_date(prediction_folder, manifest):
+        return 'up to date'
 
-# PAE plot -------------------
+    protein_names_for_title, sequence_lengths = read_input_sequences(prediction_folder)
 
-output_name = 'predicted_alignment_error.png'
+    # pickle files coming out of AF run, their features are read once into features_cache.npz and taken from there on later runs
+    model_features = load_feature_cache(prediction_folder)
+    if model_features is None:
+        model_features = {}
 
-palette = sns.diverging_palette(220, 20, as_cmap=True)
+    # finished run will produce a .json file with the model ranking
+    model_ranking = read_model_ranking(prediction_folder)
 
-fig, axs = plt.subplots(ncols=len(file_list) + 1,
-                        gridspec_kw=dict(width_ratios=width_list),
-                        figsize=(4 * len(file_list), 4))
-fig.subplots_adjust(top=0.8)
+    # read pkl, match model number with rank using json file
+    file_list, list_ranking, statistics_list = rank_models(model_features, model_ranking)
+    if not file_list:
+        print(f'No result pickles found in {prediction_folder}, nothing to plot')
+        return 'no pickles'
 
-for file_name in file_list:
-    plot_number = list_ranking.get(file_name)[1]
-    PAE = list_ranking.get(file_name)[0]['predicted_aligned_error']
-    ipTM = list_ranking.get(file_name)[0]['iptm'].round(3)
-    tick_range = [1] + list(range(100, len(PAE), 100))
-    sns.heatmap(PAE,
-                cmap=palette,
-                ax=axs[plot_number],
-                cbar=False,
-                vmin=0,
-                vmax=30)
-    if plot_number == 0:
-        axs[plot_number].set_yticks(ticks=tick_range, labels=tick_range)
-    else:
-        axs[plot_number].set_yticks([], [])
-    axs[plot_number].set_xticks(ticks=tick_range, labels=tick_range)
-    axs[plot_number].title.set_text(str('model' +
-                                        str(list_ranking.get(file_name)[1]) +
-                                        '\n iptm: ' +
-                                        str(ipTM)))
+    # figure out positions for black lines delimiting proteins in PAE plot
+    line_positions = list(accumulate(sequence_lengths))
 
-    # add black lines delimiting the two proteins
-    for element in line_positions:
-        axs[plot_number].vlines(element,
-                                ymin=0,
-                                ymax=len(PAE),
-                                color='black',
-                                linewidth=3)
-        axs[plot_number].hlines(element,
-                                xmin=0,
-                                xmax=len(PAE),
-                                color='black',
-                                linewidth=3)
+    write_model_statistics(prediction_folder, statistics_list)
 
-fig.colorbar(axs[0].collections[0], cax=axs[-1])
-fig.suptitle('Predicted alignment error ' + protein_names_for_title)
-plt.savefig(output_name)
+    # PAE plot -------------------
+    plot_pae(prediction_folder, file_list, list_ranking, line_positions, protein_names_for_title, pae_max_pixels, pae_reduction)
 
+    # pLDDT plot------------------------------
+    plot_plddt(prediction_folder, file_list, list_ranking, line_positions, protein_names_for_title)
 
-# pLDDT plot------------------------------
+    # MSA plot------------------------------
+    plot_msa(prediction_folder, line_positions)
 
-output_name = 'pLDDT.png'
+    # recorded last, so that an interrupted folder is plotted again
+    write_manifest(prediction_folder, manifest)
+    return 'plotted'
 
-fig, axs = plt.subplots(ncols=len(file_list),
-                        figsize=(6 * len(file_list), 6))
 
-for file_name in file_list:
-    plot_number = list_ranking.get(file_name)[1]
-    PAE = list_ranking.get(file_name)[0]['plddt']
-    tick_range = [1] + list(range(500, len(PAE), 500))
-    ytick_range = list(range(0, 100, 10))
+def plot_prediction_folder_task(task):
+    '''Plot a prediction folder inside a worker process, a failing folder is reported instead of stopping the other folders
+    The task holds the prediction folder and the keyword arguments of plot_prediction_folder
+    Returns the prediction folder, its status, see plot_prediction_folder, and None, or failed and the error if plotting failed
+    '''
+    prediction_folder, plot_options = task
     try:
-        axs[plot_number].plot(list(range(0, len(PAE), 1)), PAE, color='b')
-        axs[plot_number].set_yticks(ticks=ytick_range, labels=ytick_range)
-        axs[plot_number].set_xticks(ticks=tick_range, labels=tick_range)
-        axs[plot_number].title.set_text(str('model' + str(list_ranking.get(file_name)[1])))
-        for element in line_positions:
-            axs[plot_number].vlines(element, ymin=0, ymax=100, color='black')
-    except TypeError:  # handle single model and single pkl file
-        axs.plot(list(range(0, len(PAE), 1)), PAE, color='b')
-        axs.set_yticks(ticks=ytick_range, labels=ytick_range)
-        axs.set_xticks(ticks=tick_range, labels=tick_range)
-        axs.title.set_text(str('model' + str(list_ranking.get(file_name)[1])))
-        for element in line_positions:
-            axs.vlines(element, ymin=0, ymax=100, color='black')
-
-fig.colorbar(axs[0].collections[0], cax=axs[-1])
-fig.suptitle('plddt ' + protein_names_for_title)
-plt.savefig(output_name)
-
-# MSA plot------------------------------
-if "features.pkl" in glob.glob("*"):
-    features = pickle.load(open("features.pkl", "rb"))
-    plt.close()
-    plt.clf()
-    ax = sns.heatmap(features["msa"])
-    ax.set_xticks(ticks=tick_range, labels=tick_range)
-    ax.set_xlabel("residue")
-    ax.set_ylabel("sequences")
-    plt.title("MSA information, logit units")
-    for line_position in line_positions:
-        plt.vlines(line_position,
-                   ymin=0,
-                   ymax=len(features["msa"][:, 1]),
-                   color="black",
-                   linewidth=3)
-    plt.xticks(tick_range)
-    plt.subplots_adjust(bottom=0.15)
-    plt.savefig("MSA.png")
-
-print("Plotting completed successfully.")
+        status = plot_prediction_folder(prediction_folder, **plot_options)
+    except Exception as error:
+        return prediction_folder, 'failed', f'{type(error).__name__}: {error}'
+    return prediction_folder, status, None
+
+
+def plot_screen(run_path, workers=1, **plot_options):
+    '''Plot every prediction folder of a run in a pool of worker processes, plot_options are passed on to plot_prediction_folder
+    Returns the prediction folders that failed with their error
+    '''
+    prediction_folders = sorted(os.path.join(run_path, name) for name in os.listdir(run_path) if os.path.isdir(os.path.join(run_path, name)))
+    failed = {}
+    with Pool(processes=max(1, workers)) as pool:
+        for prediction_folder, status, error in pool.imap_unordered(plot_prediction_folder_task, [(prediction_folder, plot_options) for prediction_folder in prediction_folders]):
+            if error is None:
+                print(f'{prediction_folder}: {status}')
+            else:
+                print(f'{prediction_folder} failed, {error}')
+                failed[prediction_folder] = error
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write the model statistics and plot the PAE, pLDDT and MSA of a prediction folder, or of every prediction folder of a run.')
+    parser.add_argument('-path_to_prediction', type=str, default='.', help='Path to the prediction folder, default the current directory', dest='path_to_prediction')
+    parser.add_argument('-path_to_run', type=str, help='Path to a folder containing prediction folders, all of them are plotted', dest='path_to_run')
+    parser.add_argument('-workers', '--workers', type=int, default=1, help='Number of worker processes used with -path_to_run, default 1', dest='workers')
+    parser.add_argument('-pae_max_pixels', type=int, default=PAE_MAX_PIXELS, help=f'Largest number of pixels per side of a PAE panel, longer PAE matrices are block-reduced, 0 draws them at full resolution, default {PAE_MAX_PIXELS}', dest='pae_max_pixels')
+    parser.add_argument('-pae_reduction', choices=['mean', 'min'], default='mean', help='Pooling of the blocks of a reduced PAE matrix, default mean', dest='pae_reduction')
+    parser.add_argument('-force', action='store_true', help='Plot the prediction folders even if their plots are up to date with their inputs', dest='force')
+    args = parser.parse_args()
+    plot_options = {'pae_max_pixels':args.pae_max_pixels, 'pae_reduction':args.pae_reduction, 'force':args.force}
+
+    if args.path_to_run is not None:
+        failed = plot_screen(args.path_to_run, args.workers, **plot_options)
+        print(f'Plotting completed, {len(failed)} prediction folders failed.')
+        return
+    if plot_prediction_folder(args.path_to_prediction, **plot_options) == 'up to date':
+        print('Plots are up to date with the inputs, use -force to plot again.')
+        return
+    print("Plotting completed successfully.")
+
+
+if __name__ == '__main__':
+    main()
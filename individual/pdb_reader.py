@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Read the ATOM records of a PDB file into NumPy arrays in bulk.
+
+The ATOM lines are cut into their fixed PDB columns as a whole byte table instead of being parsed one line at a
+time, the atoms are selected on the raw bytes and only the selected rows have their coordinates converted, which is
+what pdockq.py and Predicted_model.read_pdb need to read large complexes quickly.
+"""
+
+import os
+import numpy as np
+
+# width of the ATOM record columns used, up to and including the B-factor
+RECORD_WIDTH = 80
+# fixed point columns of the ATOM record as start, end and number of decimals
+X_COLUMN, Y_COLUMN, Z_COLUMN = (30, 38, 3), (38, 46, 3), (46, 54, 3)
+B_COLUMN = (60, 66, 2)
+# chain id column of the ATOM, HETATM, ANISOU and TER records
+CHAIN_COLUMN = 21
+
+
+def read_record_table(pdbfile):
+    """Read the ATOM lines of a pdb file into a table of bytes
+
+    Args:
+        pdbfile (str): path to the pdb file
+
+    Returns:
+        table (np.array): uint8 array with one row of RECORD_WIDTH bytes per ATOM line, shorter lines are padded with null bytes
+    """
+    with open(pdbfile, 'rb') as f:
+        lines = [line for line in f if line.startswith(b'ATOM')]
+    if not lines:
+        return np.zeros((0, RECORD_WIDTH), dtype=np.uint8)
+    return np.array(lines, dtype=f'S{RECORD_WIDTH}').view(np.uint8).reshape(len(lines), RECORD_WIDTH)
+
+
+def _column(table, start, end):
+    """Cut the columns start:end out of the byte table as an array of byte strings"""
+    return np.ascontiguousarray(table[:, start:end]).view(f'S{end - start}').ravel()
+
+
+def _fixed_point_column(table, column):
+    """Convert a fixed point column like the coordinates (F8.3) of the byte table into floats
+
+    The digits are summed up as an integer and divided once by the power of ten of the decimals, which gives the
+    same float as parsing the text. Columns without the decimal point at its fixed position are parsed as text.
+    """
+    start, end, decimals = column
+    chars = table[:, start:end]
+    if not (chars[:, end - start - decimals - 1] == ord('.')).all():
+        return _column(table, start, end).astype(float)
+    is_digit = (chars >= ord('0')) & (chars <= ord('9'))
+    # place value of every digit when the decimal point is left out
+    place_value = np.zeros(end - start, dtype=np.int64)
+    place_value[:end - start - decimals - 1] = 10 ** np.arange(end - start - 2, decimals - 1, -1)
+    place_value[end - start - decimals:] = 10 ** np.arange(decimals - 1, -1, -1)
+    value = (np.where(is_digit, chars.astype(np.int64) - ord('0'), 0) * place_value).sum(axis=1)
+    value = np.where((chars == ord('-')).any(axis=1), -value, value)
+    return value / 10 ** decimals
+
+
+def parse_record_table(table):
+    """Parse the columns of a table of ATOM records
+
+    Args:
+        table (np.array): table of ATOM records, see read_record_table
+
+    Returns:
+        atoms (dict): arrays with one entry per ATOM record, chain (str), res_no (int), res_name (str), atm_name (str),
+            coords (float, n x 3) and B (float)
+    """
+    return {'chain':_column(table, 21, 22).astype('U1'),
+            'res_no':_column(table, 22, 26).astype(int),
+            'res_name':np.char.strip(_column(table, 17, 20)).astype('U3'),
+            'atm_name':np.char.strip(_column(table, 12, 16)).astype('U4'),
+            'coords':np.stack([_fixed_point_column(table, column) for column in (X_COLUMN, Y_COLUMN, Z_COLUMN)], axis=1),
+            'B':_fixed_point_column(table, B_COLUMN)}
+
+
+def read_atom_records(pdbfile):
+    """Read all ATOM records of a pdb file
+
+    Args:
+        pdbfile (str): path to the pdb file
+
+    Returns:
+        atoms (dict): arrays with one entry per ATOM record, see parse_record_table
+    """
+    return parse_record_table(read_record_table(pdbfile))
+
+
+def split_by_chain(chains, *arrays):
+    """Split arrays into one array per chain, with the chains in the order they appear in
+
+    Args:
+        chains (np.array): chain id of every entry
+        arrays (np.array): arrays to split, with one entry per entry of chains
+
+    Returns:
+        chain_arrays (list): for every array, a dict of chain id as key and the entries of that chain as value
+    """
+    chain_ids, first_index = np.unique(chains, return_index=True)
+    chain_ids = chain_ids[np.argsort(first_index)]
+    return [{str(chain):array[chains == chain] for chain in chain_ids} for array in arrays]
+
+
+def read_chain_ids(pdbfile):
+    """Read the chain ids of the ATOM records of a pdb file without parsing the records
+
+    Args:
+        pdbfile (str): path to the pdb file
+
+    Returns:
+        chains (list): chain ids in the order they appear in
+    """
+    chains = []
+    with open(pdbfile, 'rb') as f:
+        for line in f:
+            if line.startswith(b'ATOM'):
+                chain = line[CHAIN_COLUMN:CHAIN_COLUMN + 1].decode()
+                if chain not in chains:
+                    chains.append(chain)
+    return chains
+
+
+def chain_relabeling(chains):
+    """Find the chain ids to relabel so that the chains of a model start from A, like Predicted_model.check_chain_id did with PyMOL for models with chains B and C
+
+    Args:
+        chains (list): chain ids of the model
+
+    Returns:
+        chain_map (dict): old chain id as key and new chain id as value, the chains of a model without chain A are relabeled
+            to consecutive chain ids from A in alphabetical order, empty if the chain ids need no relabeling
+    """
+    if not chains or 'A' in chains:
+        return {}
+    new_chains = (chr(ord('A') + i) for i in range(len(chains)))
+    return {chain:new_chain for chain, new_chain in zip(sorted(chains), new_chains) if chain != new_chain}
+
+
+def relabel_chains(chains, chain_map):
+    """Relabel an array of chain ids in memory
+
+    Args:
+        chains (np.array): chain id of every entry
+        chain_map (dict): old chain id as key and new chain id as value
+
+    Returns:
+        chains (np.array): relabeled copy of the chain ids, all chains are relabeled at once so that B to A and C to B do not chain up
+    """
+    relabeled = chains.copy()
+    for old_chain, new_chain in chain_map.items():
+        relabeled[chains == old_chain] = new_chain
+    return relabeled
+
+
+def rewrite_chain_ids(pdbfile, chain_map):
+    """Rewrite the chain ids of a pdb file in place, changing only the chain id column of the ATOM, HETATM, ANISOU and TER records
+
+    Args:
+        pdbfile (str): path to the pdb file
+        chain_map (dict): old chain id as key and new chain id as value
+    """
+    byte_map = {old_chain.encode():new_chain.encode() for old_chain, new_chain in chain_map.items()}
+    # write next to the pdb file and rename, so that an interrupted rewrite never leaves a partial pdb file
+    temp_path = os.path.join(os.path.dirname(os.path.abspath(pdbfile)), f'tmp_{os.getpid()}_{os.path.basename(pdbfile)}')
+    with open(pdbfile, 'rb') as f, open(temp_path, 'wb') as out:
+        for line in f:
+            if line.startswith((b'ATOM', b'HETATM', b'ANISOU', b'TER')) and line[CHAIN_COLUMN:CHAIN_COLUMN + 1] in byte_map:
+                line = line[:CHAIN_COLUMN] + byte_map[line[CHAIN_COLUMN:CHAIN_COLUMN + 1]] + line[CHAIN_COLUMN + 1:]
+            out.write(line)
+    os.replace(temp_path, pdbfile)
+
+
+def read_pdb(pdbfile, chain_map=None):
+    """Read a pdb file predicted with AF and rewritten to contain all chains, keeping the CB atoms (CA for GLY)
+
+    Args:
+        pdbfile (str): path to the pdb file
+        chain_map (dict): chain ids to relabel while reading, see chain_relabeling
+
+    Returns:
+        chain_coords (dict): Dict of chain id as key and coordinate array (x,y,z) as value
+        chain_plddt (dict): Dict of chain id as key and plddt array as value
+    """
+    table = read_record_table(pdbfile)
+    # Get CB - CA for GLY, selected on the raw bytes of the atom and residue names, atom names of carbons start in column 14
+    atm_name = _column(table, 12, 16)
+    mask = (atm_name == b' CB ') | ((atm_name == b' CA ') & (_column(table, 17, 20) == b'GLY'))
+    atoms = parse_record_table(table[mask])
+    if chain_map:
+        atoms['chain'] = relabel_chains(atoms['chain'], chain_map)
+    chain_coords, chain_plddt = split_by_chain(atoms['chain'], atoms['coords'], atoms['B'])
+    return chain_coords, chain_plddt
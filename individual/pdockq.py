@@ -1,110 +1,40 @@
 import argparse
-import sys
 import os
 import numpy as np
-import pandas as pd
-from collections import defaultdict
-import pdb
+from pdb_reader import read_pdb
+from contacts import find_interchain_contacts
 import glob
 
-parser = argparse.ArgumentParser(description='Calculate a predicted DockQ score for a predicted structure.')
-parser.add_argument('--pdbfile', nargs=1, type=str, default=sys.stdin, help='Path to pdbfile to be scored. Note that this file needs to contain at least three chains. The B-factor column is assumed to contain the plDDT score from AlphaFold.')
-
 #####################FUNCTIONS#########################
-def parse_atm_record(line):
-    '''Get the atm record
-    '''
-    record = defaultdict()
-    record['name'] = line[0:6].strip()
-    record['atm_no'] = int(line[6:11])
-    record['atm_name'] = line[12:16].strip()
-    record['atm_alt'] = line[17]
-    record['res_name'] = line[17:20].strip()
-    record['chain'] = line[21]
-    record['res_no'] = int(line[22:26])
-    record['insert'] = line[26].strip()
-    record['resid'] = line[22:29]
-    record['x'] = float(line[30:38])
-    record['y'] = float(line[38:46])
-    record['z'] = float(line[46:54])
-    record['occ'] = float(line[54:60])
-    record['B'] = float(line[60:66])
-
-    return record
-
-def read_pdb(pdbfile):
-    '''Read a pdb file predicted with AF and rewritten to contain all chains
-    '''
-
-    chain_coords, chain_plddt = {}, {}
-    with open(pdbfile, 'r') as file:
-        for line in file:
-            if not line.startswith('ATOM'):
-                continue
-            record = parse_atm_record(line)
-            # Get CB - CA for GLY
-            if record['atm_name'] == 'CB' or (record['atm_name'] == 'CA' and record['res_name'] == 'GLY'):
-                if record['chain'] in [*chain_coords.keys()]:
-                    chain_coords[record['chain']].append([record['x'], record['y'], record['z']])
-                    chain_plddt[record['chain']].append(record['B'])
-                else:
-                    chain_coords[record['chain']] = [[record['x'], record['y'], record['z']]]
-                    chain_plddt[record['chain']] = [record['B']]
-
-    # Convert to arrays
-    for chain in chain_coords:
-        chain_coords[chain] = np.array(chain_coords[chain])
-        chain_plddt[chain] = np.array(chain_plddt[chain])
-
-    return chain_coords, chain_plddt
-
 def calc_pdockq(chain_coords, chain_plddt, t):
     '''Calculate the pDockQ scores
     pdockQ = L / (1 + np.exp(-k*(x-x0)))+b
     L= 0.724 x0= 152.611 k= 0.052 and b= 0.018
+    The interface is formed by the residues in contact with any other chain, so any number of chains of at least two is scored
     '''
 
     chains = [*chain_coords.keys()]
-    num_chains = len(chains)
-    if num_chains != 3:
-        print('This script requires PDB files with exactly three chains.')
+    if len(chains) < 2:
+        print('This script requires PDB files with at least two chains.')
         return None, None
 
-    coords = [chain_coords[ch] for ch in chains]
-    plddts = [chain_plddt[ch] for ch in chains]
+    coords = np.concatenate([chain_coords[ch] for ch in chains])
+    plddt = np.concatenate([chain_plddt[ch] for ch in chains])
+    chain_index = np.repeat(np.arange(len(chains)), [len(chain_coords[ch]) for ch in chains])
 
-    # Calculate distances between all atoms
-    a_min_b = coords[0][:, np.newaxis, :] - coords[1][np.newaxis, :, :]
-    dists_ab = np.sqrt(np.sum(a_min_b.T ** 2, axis=0)).T
-    a_min_c = coords[0][:, np.newaxis, :] - coords[2][np.newaxis, :, :]
-    dists_ac = np.sqrt(np.sum(a_min_c.T ** 2, axis=0)).T
-    b_min_c = coords[1][:, np.newaxis, :] - coords[2][np.newaxis, :, :]
-    dists_bc = np.sqrt(np.sum(b_min_c.T ** 2, axis=0)).T
+    # Find the residue pairs of all chain pairs within the threshold with a cell list instead of full distance matrices
+    contacts, _ = find_interchain_contacts(coords, chain_index, t)
 
-    contact_dists = [dists_ab, dists_ac, dists_bc]
-    contacts = [np.argwhere(d <= t) for d in contact_dists]
-    
-    if all(len(contact) == 0 for contact in contacts):
+    if len(contacts) == 0:
         pdockq = 0
         ppv = 0
     else:
-        all_if_plddt = []
-        for chain_idx in range(len(plddts)):
-            unique_contact_indices = np.unique(contacts[chain_idx][:, 0])
-            if len(unique_contact_indices) > 0:
-                # Ensure that indices are within bounds
-                valid_indices = unique_contact_indices[unique_contact_indices < len(plddts[chain_idx])]
-                if len(valid_indices) > 0:
-                    all_if_plddt.append(plddts[chain_idx][valid_indices])
-    
-        if len(all_if_plddt) > 0:
-            avg_if_plddt = np.average(np.concatenate(all_if_plddt))
-    
-            n_if_contacts = sum(len(contact) for contact in contacts)
-            x = avg_if_plddt * np.log10(n_if_contacts)
-            pdockq = 0.724 / (1 + np.exp(-0.052 * (x - 152.611))) + 0.018
-        else:
-            pdockq = 0
+        # residues at the interface, on either side of a contact
+        if_residues = np.unique(contacts)
+        avg_if_plddt = np.average(plddt[if_residues])
+        n_if_contacts = len(contacts)
+        x = avg_if_plddt * np.log10(n_if_contacts)
+        pdockq = 0.724 / (1 + np.exp(-0.052 * (x - 152.611))) + 0.018
     
         PPV = np.array([0.98128027, 0.96322524, 0.95333044, 0.9400192,
                         0.93172991, 0.92420274, 0.91629946, 0.90952562, 0.90043139,
@@ -132,41 +62,73 @@ def calc_pdockq(chain_coords, chain_plddt, t):
     return pdockq, ppv
 
 
-#################MAIN####################
-
-# Get a list of pdb files using glob
-pdb_files = glob.glob('*_model_*.pdb')
-
-# Create a list to store the scores
-scores = []
-
-# Loop over the pdb files
-for pdb_file in pdb_files:
+def score_pdb(pdb_file, t=8):
+    '''Score a predicted model with pDockQ
+    t is the distance threshold between CB atoms (CA for GLY), 8 Å by default
+    Returns a dict with the pdb file, pdockq and ppv, or None if the model has only one chain
+    '''
     # Read chains
     chain_coords, chain_plddt = read_pdb(pdb_file)
 
     # Check chains
     if len(chain_coords.keys()) < 2:
         print('Only one chain in pdb file:', pdb_file)
-        continue
+        return None
 
     # Calculate pdockq
-    t = 8  # Distance threshold, set to 8 Å
     pdockq, ppv = calc_pdockq(chain_coords, chain_plddt, t)
-    
-    # Store the scores in a dictionary
-    score_dict = {
-        'pdb_file': pdb_file,
-        'pdockq': pdockq,
-        'ppv': ppv
-    }
-    scores.append(score_dict)
-
-# Create a DataFrame from the scores list
-scores_df = pd.DataFrame(scores)
-
-# Sort the scores based on the pdb_file name
-scores_df = scores_df.sort_values(by='pdb_file')
-
-# Save the scores to a CSV file
-scores_df.to_csv('pdockq.csv', index=False)
+    return {'pdb_file': pdb_file, 'pdockq': pdockq, 'ppv': ppv}
+
+
+def score_pdb_files(pdb_files, t=8):
+    '''Score many predicted models with pDockQ in this process
+    Returns a DataFrame with the columns pdb_file, pdockq and ppv sorted by pdb_file
+    '''
+    # pandas is only needed for the tables, scoring single models with score_pdb does not import it
+    import pandas as pd
+    scores = [score for score in (score_pdb(pdb_file, t) for pdb_file in pdb_files) if score is not None]
+    scores_df = pd.DataFrame(scores, columns=['pdb_file', 'pdockq', 'ppv'])
+    # Sort the scores based on the pdb_file name
+    return scores_df.sort_values(by='pdb_file').reset_index(drop=True)
+
+
+def score_folder(folder, pattern='*_model_*.pdb', t=8, write_csv=True):
+    '''Score the predicted models of a prediction folder matching pattern, without changing the working directory
+    The pdb_file column holds the file names relative to the folder, and the scores are saved to pdockq.csv in the folder
+    Returns the DataFrame of the scores
+    '''
+    pdb_files = glob.glob(os.path.join(folder, pattern))
+    scores_df = score_pdb_files(pdb_files, t)
+    scores_df['pdb_file'] = scores_df['pdb_file'].map(os.path.basename)
+    if write_csv:
+        scores_df.to_csv(os.path.join(folder, 'pdockq.csv'), index=False)
+    return scores_df
+
+
+def score_folders(folders, pattern='*_model_*.pdb', t=8, write_csv=True):
+    '''Score the predicted models of many prediction folders in this process
+    Returns a dict with the folder as key and the DataFrame of its scores as value
+    '''
+    return {folder: score_folder(folder, pattern, t, write_csv) for folder in folders}
+
+
+#################MAIN####################
+
+def main():
+    parser = argparse.ArgumentParser(description='Calculate a predicted DockQ score for a predicted structure.')
+    parser.add_argument('--pdbfile', nargs='+', type=str, help='Path to pdbfiles to be scored, the scores are printed. Note that the files need to contain at least two chains. The B-factor column is assumed to contain the plDDT score from AlphaFold.')
+    parser.add_argument('--folders', nargs='+', type=str, help='Prediction folders whose *_model_*.pdb files are scored, the scores are saved to pdockq.csv in every folder')
+    parser.add_argument('--threshold', type=float, default=8, help='Distance threshold between CB atoms in Å, default 8')
+    args = parser.parse_args()
+
+    if args.pdbfile is not None:
+        print(score_pdb_files(args.pdbfile, args.threshold).to_csv(index=False), end='')
+    elif args.folders is not None:
+        score_folders(args.folders, t=args.threshold)
+    else:
+        # Score the pdb files of the current directory and save the scores to pdockq.csv
+        score_folder('.', t=args.threshold)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Read the result_model_*_multimer_v*.pkl pickles written by AlphaFold without loading the arrays that are not needed.
+
+Next to a handful of scalar confidences, the result pickles hold the distogram, the aligned confidence probabilities,
+the PAE and the structure module output, which together take up gigabytes for large complexes. read_result_pickle
+seeks past the data of every array with more dimensions than requested instead of reading it, and stands in for JAX
+so that the pickles can be read where JAX is not installed.
+"""
+
+import io
+import os
+import sys
+import pickle
+from struct import unpack
+import numpy as np
+
+# modules numpy reconstructs its arrays from, numpy 2 renamed numpy.core to numpy._core
+NUMPY_MULTIARRAY_MODULES = ('numpy.core.multiarray', 'numpy._core.multiarray')
+NUMPY_NUMERIC_MODULES = ('numpy.core.numeric', 'numpy._core.numeric')
+
+
+class _Skipped_data:
+    """Stands in for the raw data of an array that was skipped while unpickling"""
+    def __init__(self, size):
+        self.size = size
+
+
+class _Array_placeholder:
+    """Stands in for a numpy array while unpickling and keeps the array only if its data was read"""
+    def __init__(self, *args):
+        self.array = None
+
+    def __setstate__(self, state):
+        if isinstance(state[-1], _Skipped_data):
+            return
+        self.array = np.empty(0, dtype='b')
+        self.array.__setstate__(state)
+
+
+class _Jax_placeholder:
+    """Stands in for any JAX object while unpickling, keeping the numpy array it was built from if there is one"""
+    def __init__(self, *args, **kwargs):
+        self.array = self.find_array(args)
+
+    def find_array(self, args):
+        """Search the arguments, and the tuples among them, for the numpy array a JAX array is reconstructed from"""
+        for arg in args:
+            if isinstance(arg, (np.ndarray, np.generic, _Array_placeholder)):
+                return arg
+            if isinstance(arg, tuple):
+                array = self.find_array(arg)
+                if array is not None:
+                    return array
+        return None
+
+    def __setstate__(self, state):
+        pass
+
+
+class Lean_unpickler(pickle._Unpickler):
+    """Unpickler that skips the data of arrays with more than max_ndim dimensions, or stored under other keys than the
+    ones asked for, and does not need JAX
+
+    The pure Python unpickler is used because it allows to replace the opcodes reading raw bytes. With pickle
+    protocol 4, which AlphaFold writes its results with, the data of a numpy array is the last item of its state
+    tuple (version, shape, dtype, is_fortran, data), so the shape is already on the stack when the data is reached
+    and the data can be skipped with a seek. The items of a dict are on the stack below the state tuple, so the key
+    an array is stored under is known as well.
+    """
+    dispatch = dict(pickle._Unpickler.dispatch)
+
+    def __init__(self, file, max_ndim=1, keys=None):
+        """Initialize an instance of Lean_unpickler
+
+        Args:
+            file (file object): result pickle opened in binary mode
+            max_ndim (int): arrays with up to this many dimensions are read, the others are skipped
+            keys (collection): if given, only the arrays stored directly under these keys of a dict are read
+        """
+        super().__init__(file)
+        self.file = file
+        self.max_ndim = max_ndim
+        self.keys = keys
+
+    def find_class(self, module, name):
+        if module.split('.')[0] in ('jax', 'jaxlib'):
+            return _Jax_placeholder
+        if module in NUMPY_MULTIARRAY_MODULES and name == '_reconstruct':
+            return _Array_placeholder
+        if module in NUMPY_NUMERIC_MODULES and name == '_frombuffer':
+            return self.frombuffer
+        return super().find_class(module, name)
+
+    def frombuffer(self, buffer, dtype, shape, order):
+        """Replacement of numpy's _frombuffer used by pickle protocol 5. The data comes before the shape with this protocol, so it cannot be skipped, only dropped after reading it"""
+        if len(shape) > self.max_ndim:
+            return None
+        return np.frombuffer(buffer, dtype=dtype).reshape(shape, order=order)
+
+    def is_skipped_array_data(self):
+        """Check whether the bytes about to be read are the data of an array with more than max_ndim dimensions or stored under a key that was not asked for"""
+        stack = self.stack
+        if not (len(stack) == 4 and stack[0] == 1 and isinstance(stack[1], tuple) and self._unframer.current_frame is None):
+            return False
+        if len(stack[1]) > self.max_ndim:
+            return True
+        if self.keys is None:
+            return False
+        # the array being built and the key it is stored under are the last items below the state tuple
+        items = self.metastack[-1] if self.metastack else []
+        key = items[-2] if len(items) >= 2 and isinstance(items[-1], _Array_placeholder) else None
+        return key not in self.keys
+
+    def skip(self, size):
+        """Move past size bytes of the pickle without keeping them"""
+        if self.file.seekable():
+            self.file.seek(size, io.SEEK_CUR)
+        else:
+            remaining = size
+            while remaining > 0:
+                remaining -= len(self.file.read(min(remaining, 1 << 24)))
+        self.append(_Skipped_data(size))
+
+    def load_binbytes(self):
+        size, = unpack('<I', self.read(4))
+        if self.is_skipped_array_data():
+            self.skip(size)
+        else:
+            self.append(self.read(size))
+    dispatch[pickle.BINBYTES[0]] = load_binbytes
+
+    def load_binbytes8(self):
+        size, = unpack('<Q', self.read(8))
+        if self.is_skipped_array_data():
+            self.skip(size)
+        else:
+            self.append(self.read(size))
+    dispatch[pickle.BINBYTES8[0]] = load_binbytes8
+
+
+def _unwrap(obj):
+    """Replace the placeholders left by Lean_unpickler by the arrays they kept, the skipped arrays become None"""
+    if isinstance(obj, (_Array_placeholder, _Jax_placeholder)):
+        return _unwrap(obj.array)
+    if isinstance(obj, dict):
+        return {key:_unwrap(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_unwrap(value) for value in obj)
+    return obj
+
+
+def read_result_pickle(pickle_path, max_ndim=1, keys=None):
+    """Read an AlphaFold result pickle, skipping the arrays with more than max_ndim dimensions
+
+    Args:
+        pickle_path (str): path to the result pickle
+        max_ndim (int): 1 reads the scalar confidences (ptm, iptm, ranking_confidence) and the per-residue plddt,
+            2 additionally reads the predicted_aligned_error
+        keys (collection): if given, only the arrays under these keys are read, like the msa of features.pkl
+
+    Returns:
+        pickle_data (dict): the content of the pickle, the skipped arrays are None
+    """
+    with open(pickle_path, 'rb') as f:
+        return _unwrap(Lean_unpickler(f, max_ndim=max_ndim, keys=keys).load())
+
+
+def read_result_scalars(pickle_path):
+    """Read only the scalar confidences and the per-residue plddt of an AlphaFold result pickle
+
+    Args:
+        pickle_path (str): path to the result pickle
+
+    Returns:
+        scalars (dict): ptm, iptm and ranking_confidence as float and plddt as array, None if missing from the pickle
+    """
+    pickle_data = read_result_pickle(pickle_path, max_ndim=1)
+    scalars = {key:(float(pickle_data[key]) if pickle_data.get(key) is not None else None) for key in ('ptm', 'iptm', 'ranking_confidence')}
+    scalars['plddt'] = pickle_data.get('plddt')
+    return scalars
+
+
+if __name__ == '__main__':
+    for pickle_path in sys.argv[1:]:
+        print(os.path.basename(pickle_path), {key:value for key, value in read_result_scalars(pickle_path).items() if key != 'plddt'})
@@ -7,22 +7,7 @@ Input:
 Output: Segment of full length amino acid sequence fasta file (Saved to output 
 '''
 import argparse
-
-'''
-Reads a FASTA file and returns a dictionary where keys are sequence IDs and values are sequences.
-'''
-def read_fasta(file_path):
-    sequences = {}
-    current_id = None
-    with open(file_path, "r") as fasta_file:
-        for line in fasta_file:
-            line = line.strip()
-            if line.startswith(">"):
-                current_id = line[1:]
-                sequences[current_id] = ""
-            elif current_id is not None:
-                sequences[current_id] += line
-    return sequences
+from fasta_library import iter_fasta, Fasta_library
 
 '''
 Extracts subsequence from a given sequence based on start and end indices.
@@ -30,17 +15,24 @@ Extracts subsequence from a given sequence based on start and end indices.
 def extract_subsequence(sequence, start_index, end_index):
     return sequence[start_index - 1:end_index]  # Adjust for 1-based indexing
 
-def main(input_file, output_file, start_index, end_index):
-    # Read the FASTA file
-    fasta_sequences = read_fasta(input_file)
+def main(input_file, output_file, start_index, end_index, identifier=None):
+    # Read the first sequence of the FASTA file, or the sequence of the identifier from a FASTA library
+    if identifier is not None:
+        with Fasta_library(input_file) as library:
+            if identifier not in library:
+                print(f"{identifier} not found in the FASTA library {input_file}.")
+                return
+            first_record = library.records(identifier)[0]
+    else:
+        first_record = next(iter_fasta(input_file), None)
 
     # Check if there is at least one sequence in the file
-    if not fasta_sequences:
+    if first_record is None:
         print("No sequences found in the FASTA file.")
         return
 
     # Extract the first sequence and its ID
-    first_sequence_id, first_sequence = list(fasta_sequences.items())[0]
+    first_sequence_id, first_sequence = first_record
     first_sequence_id = first_sequence_id + "{start_index}" + "-" + "{end_index}"
 
     # Extract the subsequence
@@ -57,7 +49,8 @@ if __name__ == "__main__":
     parser.add_argument("output_file", help="Path to save the output segment of the sequence.")
     parser.add_argument("start_index", type=int, help="Start residue number of the amino acid sequence.")
     parser.add_argument("end_index", type=int, help="End residue number of the amino acid sequence.")
+    parser.add_argument("--identifier", help="Chop the sequence of this identifier, the input is then an indexed FASTA library file or a folder of <identifier>.fasta files.")
 
     args = parser.parse_args()
 
-    main(args.input_file, args.output_file, args.start_index, args.end_index)
+    main(args.input_file, args.output_file, args.start_index, args.end_index, args.identifier)
@@ -1,78 +1,72 @@
 '''
 The purpose of this script is to combine two fastas for an AlphaFold screen
 
-Input: 
-    1. Path to a folder with all the fasta files for the proteins to screen against
-    2. Path to fasta with the fasta file of your protein of interest
+Input:
+    1. Path to a folder with all the fasta files for the proteins to screen against, or to a single library fasta file
+    2. Path to the fasta file of your protein of interest, the bait, or several of them to screen every bait in one pass
     3. Path to a folder where the combined fasta files are saved
 
-Output: 
-    1. Folder with all combined fasta files
+Output:
+    1. Folder with all combined fasta files, named by --name_template from the library identifier and the bait file name
+
+The baits are read once, the library proteins are read one at a time and the combined fasta files are written by a
+pool of threads.
 '''
 
 import os
 import argparse
+from fasta_library import Fasta_library, iter_fasta, write_fasta_files
 
-def is_fasta_file(file_name):
-    return file_name.lower().endswith(".fasta")
-
-def read_fasta_file(file_path, encoding='utf-8'):
-    sequences = {}
-    current_header = ""
-    try:
-        with open(file_path, "r", encoding=encoding) as file:
-            content = file.read()
-
-            # Check if the content contains the '>' symbol
-            if '>' in content:
-                lines = content.split('\n')
-                for line in lines:
-                    line = line.strip()
-                    if line.startswith(">"):
-                        current_header = line
-                        sequences[current_header] = ""
-                    else:
-                        sequences[current_header] += line
-            else:
-                print(f"Skipping file '{file_path}' as it does not contain FASTA format.")
-    except Exception as e:
-        print(f"Error processing file '{file_path}': {e}")
-        print(f"Contents of the file: {content}")
-
-    return sequences
+def read_baits(appended_fasta_paths):
+    # bait name: records of the bait fasta file, the name is the file name without extension
+    baits = {}
+    for appended_fasta_path in appended_fasta_paths:
+        bait_name = os.path.splitext(os.path.basename(appended_fasta_path))[0]
+        records = list(iter_fasta(appended_fasta_path))
+        if not records:
+            print(f"Skipping bait '{appended_fasta_path}' as it does not contain FASTA format.")
+            continue
+        baits[bait_name] = records
+    return baits
 
-def write_fasta_file(file_path, sequences, encoding='utf-8'):
-    with open(file_path, "w", encoding=encoding) as file:
-        for header, sequence in sequences.items():
-            file.write(header + "\n")
-            file.write(sequence + "\n")
+def combined_fasta_files(library, baits, output_fasta_path, name_template):
+    # yield the path and records of every library protein against every bait, the library protein first
+    for identifier in library.identifiers():
+        try:
+            records = library.records(identifier)
+        except Exception as e:
+            print(f"Error processing '{identifier}': {e}")
+            continue
+        if not records:
+            print(f"Skipping '{identifier}' as it does not contain FASTA format.")
+            continue
+        for bait_name, bait_records in baits.items():
+            output_file = os.path.join(output_fasta_path, name_template.format(library=identifier, bait=bait_name) + ".fasta")
+            yield output_file, records + bait_records
 
-def main(fasta_folder_path, appended_fasta_path, output_fasta_path):
-    for filename in os.listdir(fasta_folder_path):
-        if is_fasta_file(filename):
-            input_file = os.path.join(fasta_folder_path, filename)
-            appended_fasta = appended_fasta_path
+def main(fasta_folder_path, appended_fasta_paths, output_fasta_path, name_template="{library}_{bait}", workers=8):
+    if isinstance(appended_fasta_paths, str):
+        appended_fasta_paths = [appended_fasta_paths]
+    baits = read_baits(appended_fasta_paths)
+    if not baits:
+        print("No bait sequences found.")
+        return
+    if not os.path.exists(output_fasta_path):
+        os.makedirs(output_fasta_path)
 
-            try:
-                existing_sequence = read_fasta_file(input_file)
-                new_sequence = read_fasta_file(appended_fasta)
-                existing_sequence.update(new_sequence)
-                output_file = os.path.join(output_fasta_path, filename.replace(".fasta", "_PAX3_FOX01.fasta"))
-                write_fasta_file(output_file, existing_sequence)
-            except Exception as e:
-                print(f"Error processing file '{filename}': {e}")
-                print(f"Contents of the file: {read_file_content(input_file)}")
-
-def read_file_content(file_path):
-    with open(file_path, "r", encoding='utf-8') as file:
-        return file.read()
+    # the proteins to screen against are a folder of FASTA files or an indexed FASTA library file
+    with Fasta_library(fasta_folder_path) as library:
+        num_files = write_fasta_files(combined_fasta_files(library, baits, output_fasta_path, name_template), workers)
+    print(f"{num_files} combined FASTA files written to {output_fasta_path}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Combine two FASTA files for AlphaFold screening.")
-    parser.add_argument("fasta_folder_path", help="Path to the folder with all the FASTA files for the proteins to screen against.")
-    parser.add_argument("appended_fasta_path", help="Path to the FASTA file of your protein of interest.")
+    parser.add_argument("fasta_folder_path", help="Path to the folder with all the FASTA files for the proteins to screen against, or to an indexed FASTA library file.")
+    parser.add_argument("appended_fasta_path", nargs="+", help="Path to the FASTA file of your protein of interest, several files screen every bait against the library.")
     parser.add_argument("output_fasta_path", help="Path to the folder where the combined FASTA files will be saved.")
-    
+    parser.add_argument("--name_template", default="{library}_{bait}", help="Name of the combined FASTA files from the {library} identifier and the {bait} file name without extension, default {library}_{bait}.")
+    parser.add_argument("--workers", type=int, default=8, help="Number of threads writing the combined FASTA files, default 8.")
+
     args = parser.parse_args()
-    
-    main(args.fasta_folder_path, args.appended_fasta_path, args.output_fasta_path)
+
+    main(args.fasta_folder_path, args.appended_fasta_path, args.output_fasta_path, args.name_template, args.workers)
@@ -5,75 +5,127 @@
 The purpose of this script is to combine two fastas for an AlphaFold screen. This script differs from the normal combined_fasta, as it combines fastas
 from a csv that has different protein pairs, not the same protein against the same proteins.
 
-Input: 
-    1. CSV file with all the protein pairs
-    2. Path to a folder with all the fasta files for the proteins in the csv file
+Input:
+    1. CSV file with all the protein pairs, in the columns uid1 and uid2
+    2. Path to a folder with all the fasta files for the proteins in the csv file, or to an indexed library fasta file
     3. Path to an output folder where the combined fasta files are saved
 
-Output: 
+Output:
     1. Folder with all combined fasta files located at the path from input #3
+    2. missing_uids.csv in the same folder with the uids that were not found and the number of pairs they were part of, if any
+    3. With --link_folder, links named <uid1>_<uid2> to the prediction folders of pairs predicted in an earlier registered run
+
+The csv file is read in chunks, the sequences of the proteins are kept in a bounded cache since the same proteins show up
+in many pairs, and the combined fasta files are written by a pool of threads. A pair with the same chain sequences as an
+earlier pair of the csv, e.g. B_A after A_B, is combined once, and with --registry the pairs predicted, or queued by other
+screens, are skipped or, with --link_folder, linked to their prediction folder, see prediction_registry.py.
 '''
 
 import os
 import argparse
+from collections import Counter
+from functools import lru_cache
 import pandas as pd
+from fasta_library import Fasta_library, write_fasta_files
+from prediction_registry import Prediction_registry, canonical_key
 
-def is_fasta_file(file_name):
-    return file_name.lower().endswith(".fasta")
+def read_pairs(csv_path, chunksize=100000):
+    # yield the uid1 and uid2 of every row of the csv file, chunksize rows at a time
+    for chunk in pd.read_csv(csv_path, usecols=['uid1', 'uid2'], dtype=str, chunksize=chunksize):
+        yield from zip(chunk['uid1'], chunk['uid2'])
 
-def read_fasta_file(file_path, encoding='utf-8'):
-    sequences = {}
-    try:
-        with open(file_path, "r", encoding=encoding) as file:
-            current_header = ""
-            for line in file:
-                line = line.strip()
-                if line.startswith(">"):
-                    current_header = line
-                    sequences[current_header] = ""
+def combined_fasta_files(pairs, library, output_fasta_path, missing_uids, reuse, cache_size=10000, registry=None, screen=None, link_folder=None, pending_keys=None):
+    # yield the path and records of every pair whose proteins are both in the library, the pairs of missing uids are counted in missing_uids
+    # pairs with the chain sequences of an earlier pair of this csv, or predicted or queued by another screen of the registry, are counted in reuse and not combined again
+    # the pairs queued by this screen in an earlier pass are combined again, and the sequence key of every yielded path is kept in pending_keys until its file is written
+    @lru_cache(maxsize=cache_size)
+    def cached_records(uid):
+        return library.records(uid) if uid in library else None
+
+    combined_keys = set()
+    for uid1, uid2 in pairs:
+        records1 = cached_records(uid1)
+        records2 = cached_records(uid2)
+        if records1 is None or records2 is None:
+            missing_uids.update(uid for uid, records in ((uid1, records1), (uid2, records2)) if records is None)
+            continue
+        prediction_name = f"{uid1}_{uid2}"
+        records = records1 + records2
+        sequence_key = canonical_key(sequence for header, sequence in records)
+        if sequence_key in combined_keys:
+            reuse['duplicate pairs'] += 1
+            continue
+        combined_keys.add(sequence_key)
+        if registry is not None:
+            prediction = registry.lookup(sequence_key)
+            if prediction is not None and (prediction[1] is not None or prediction[2] != screen):
+                existing_folder = prediction[1]
+                if link_folder is not None and existing_folder is not None and os.path.isdir(existing_folder):
+                    link_path = os.path.join(link_folder, prediction_name)
+                    if not os.path.lexists(link_path):
+                        os.symlink(existing_folder, link_path)
+                    reuse['linked to earlier predictions'] += 1
                 else:
-                    sequences[current_header] += line
-    except Exception as e:
-        print(f"Error processing file '{file_path}': {e}")
-    return sequences
-
-def write_fasta_file(file_path, sequences, encoding='utf-8'):
-    with open(file_path, "w", encoding=encoding) as file:
-        for header, sequence in sequences.items():
-            file.write(header + "\n")
-            file.write(sequence + "\n")
-
-def main(csv_path, fasta_folder_path, output_fasta_path):
-    df = pd.read_csv(csv_path)
+                    reuse['already predicted or queued by other screens'] += 1
+                continue
+        output_file = os.path.join(output_fasta_path, f"{prediction_name}.fasta")
+        if pending_keys is not None:
+            pending_keys[output_file] = (sequence_key, prediction_name)
+        yield output_file, records
+
+def write_missing_uids(output_fasta_path, missing_uids):
+    missing_path = os.path.join(output_fasta_path, 'missing_uids.csv')
+    pd.DataFrame(missing_uids.most_common(), columns=['uid', 'num_pairs']).to_csv(missing_path, index=False)
+    return missing_path
+
+def main(csv_path, fasta_folder_path, output_fasta_path, workers=8, chunksize=100000, cache_size=10000, registry_path=None, screen=None, link_folder=None):
     if not os.path.exists(output_fasta_path):
         os.makedirs(output_fasta_path)
-    
-    for index, row in df.iterrows():
-        protein1_fasta = os.path.join(fasta_folder_path, row['uid1'] + '.fasta')
-        protein2_fasta = os.path.join(fasta_folder_path, row['uid2'] + '.fasta')
-        output_file = os.path.join(output_fasta_path, f"{row['uid1']}_{row['uid2']}.fasta")
-        
-        if os.path.isfile(protein1_fasta) and os.path.isfile(protein2_fasta):
-            print(f"Combining '{protein1_fasta}' and '{protein2_fasta}' into '{output_file}'")
-
-            sequences1 = read_fasta_file(protein1_fasta)
-            sequences2 = read_fasta_file(protein2_fasta)
-
-            combined_sequences = {**sequences1, **sequences2}
-
-            write_fasta_file(output_file, combined_sequences)
-        else:
-            if not os.path.isfile(protein1_fasta):
-                print(f"'{protein1_fasta}' does not exist in the folder '{fasta_folder_path}'.")
-            if not os.path.isfile(protein2_fasta):
-                print(f"'{protein2_fasta}' does not exist in the folder '{fasta_folder_path}'.")
+    if link_folder is not None and not os.path.exists(link_folder):
+        os.makedirs(link_folder)
+
+    missing_uids = Counter()
+    reuse = Counter()
+    registry = Prediction_registry(registry_path) if registry_path is not None else None
+    if registry is not None:
+        registry.open()
+    try:
+        # the proteins are a folder of <uid>.fasta files or an indexed FASTA library file
+        with Fasta_library(fasta_folder_path) as library:
+            pairs = read_pairs(csv_path, chunksize)
+            # a pair is registered only once its fasta file is written, so that a failed or interrupted write does not leave it queued
+            pending_keys = {}
+            def register_written(output_file):
+                sequence_key, prediction_name = pending_keys.pop(output_file)
+                if registry is not None:
+                    registry.register(sequence_key, prediction_name, screen)
+            fasta_files = combined_fasta_files(pairs, library, output_fasta_path, missing_uids, reuse, cache_size, registry, screen, link_folder, pending_keys)
+            num_files = write_fasta_files(fasta_files, workers, on_written=register_written)
+    finally:
+        if registry is not None:
+            registry.close()
+    print(f"{num_files} combined FASTA files written to '{output_fasta_path}'")
+
+    if reuse:
+        print(f"{sum(reuse.values())} predictions saved: " + ', '.join(f"{count} {reason}" for reason, count in reuse.items()))
+
+    if missing_uids:
+        missing_path = write_missing_uids(output_fasta_path, missing_uids)
+        print(f"{len(missing_uids)} uids do not exist in '{fasta_folder_path}', the pairs with them were skipped, see '{missing_path}'")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Combine two FASTA files for AlphaFold screening.")
     parser.add_argument("csv_path", help="Path to the CSV file that has all the protein pairs")
-    parser.add_argument("fasta_folder_path", help="Path to the folder with all the FASTA files for the proteins to screen against.")
+    parser.add_argument("fasta_folder_path", help="Path to the folder with all the FASTA files for the proteins to screen against, or to an indexed FASTA library file.")
     parser.add_argument("output_fasta_path", help="Path to the folder where the combined FASTA files will be saved.")
-    
+    parser.add_argument("--workers", type=int, default=8, help="Number of threads writing the combined FASTA files, default 8.")
+    parser.add_argument("--chunksize", type=int, default=100000, help="Number of rows of the CSV file read at a time, default 100000.")
+    parser.add_argument("--cache_size", type=int, default=10000, help="Number of proteins whose sequences are kept in memory, default 10000.")
+    parser.add_argument("--registry", help="Path to the prediction registry, see prediction_registry.py. Pairs already in it are skipped and the new pairs are registered.")
+    parser.add_argument("--screen", help="Name of this screen in the registry, default the name of the output folder.")
+    parser.add_argument("--link_folder", help="Folder where the pairs already predicted in a registered run are linked to their prediction folder instead of skipped.")
+
     args = parser.parse_args()
-    
-    main(args.csv_path, args.fasta_folder_path, args.output_fasta_path)
+
+    screen = args.screen if args.screen is not None else os.path.basename(os.path.abspath(args.output_fasta_path))
+    main(args.csv_path, args.fasta_folder_path, args.output_fasta_path, args.workers, args.chunksize, args.cache_size, args.registry, screen, args.link_folder)
@@ -0,0 +1,211 @@
+"""
+This module holds the fasta reading shared by the preprocessing scripts and the metrics of the prediction folders
+
+A fasta library is either a single fasta file, indexed once into a samtools style .fai file next to it and read through
+mmap so that a sequence is served by its identifier without loading the file, or a folder with one <identifier>.fasta
+file per protein as written by seperate_fasta.py.
+"""
+
+import mmap
+import os
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# characters that are kept in the identifiers used as file names
+UNSAFE_CHARACTERS = re.compile(r'[^A-Za-z0-9._-]')
+
+
+def iter_fasta(file_path, encoding='utf-8'):
+    '''Yield the header, without the >, and the sequence of every record of a fasta file, one record at a time'''
+    header = None
+    sequence = []
+    with open(file_path, 'r', encoding=encoding) as fasta_file:
+        for line in fasta_file:
+            line = line.strip()
+            if line.startswith('>'):
+                if header is not None:
+                    yield header, ''.join(sequence)
+                header = line[1:]
+                sequence = []
+            elif header is not None:
+                sequence.append(line)
+    if header is not None:
+        yield header, ''.join(sequence)
+
+
+def read_fasta(file_path, encoding='utf-8'):
+    '''Read a fasta file into a dict with the headers, without the >, as keys and the sequences as values
+    Records sharing a header keep the last sequence, use iter_fasta to keep all of them
+    '''
+    return dict(iter_fasta(file_path, encoding))
+
+
+def write_fasta(file_path, records, encoding='utf-8'):
+    '''Write the header, without the >, and sequence pairs of records to a fasta file, one sequence line per record'''
+    with open(file_path, 'w', encoding=encoding) as fasta_file:
+        for header, sequence in records:
+            fasta_file.write(f">{header}\n{sequence}\n")
+
+
+def write_fasta_files(fasta_files, workers=8, encoding='utf-8', on_written=None):
+    '''Write the file path and records pairs of fasta_files, see write_fasta, with a pool of workers threads
+    fasta_files is consumed lazily, at most 4 files per thread wait to be written and a written file is only counted, so memory stays bounded however many files are written
+    on_written, if given, is called with the path of every file written successfully, in the calling thread between submissions and once all files are done
+    Returns the number of files written, the first write error stops the submission of further files and is raised once the submitted files are done
+    '''
+    workers = max(1, workers)
+    pending = threading.BoundedSemaphore(4 * workers)
+    errors = []
+    written = deque()
+
+    def file_done(future, file_path):
+        if future.exception() is not None:
+            errors.append(future.exception())
+        elif on_written is not None:
+            written.append(file_path)
+        pending.release()
+
+    def report_written():
+        while written:
+            on_written(written.popleft())
+
+    num_submitted = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for file_path, records in fasta_files:
+            pending.acquire()
+            report_written()
+            if errors:
+                break
+            executor.submit(write_fasta, file_path, records, encoding).add_done_callback(lambda future, file_path=file_path: file_done(future, file_path))
+            num_submitted += 1
+    report_written()
+    if errors:
+        raise errors[0]
+    return num_submitted
+
+
+def header_identifier(header):
+    '''Identifier of a fasta header
+    The accession of UniProt headers like sp|P12345|NAME_HUMAN, otherwise the first word of the header,
+    with the characters that are unsafe in file names replaced by _
+    '''
+    words = header.split()
+    identifier = words[0] if words else ''
+    fields = identifier.split('|')
+    if len(fields) > 2 and fields[0] in ('sp', 'tr'):
+        identifier = fields[1]
+    return UNSAFE_CHARACTERS.sub('_', identifier)
+
+
+def build_fasta_index(fasta_path):
+    '''Index a fasta file into fasta_path.fai with the columns of samtools faidx: identifier, length, offset of the sequence,
+    residues per line and bytes per line, the identifiers are given by header_identifier
+    Records without identifier or with the identifier of an earlier record are reported and left out of the index
+    Returns a dict with the identifier as key and the other columns as value
+    '''
+    index = {}
+    with open(fasta_path, 'rb') as fasta_file:
+        record = None
+        offset = 0
+        for line in fasta_file:
+            if line.startswith(b'>'):
+                record = None
+                identifier = header_identifier(line[1:].decode().strip())
+                if not identifier:
+                    print(f"Skipping record without identifier in {fasta_path}: {line.decode().strip()}")
+                elif identifier in index:
+                    print(f"Skipping duplicate identifier {identifier} in {fasta_path}")
+                else:
+                    record = index[identifier] = [0, offset + len(line), 0, 0]
+            elif record is not None and line.strip():
+                if record[2] == 0:
+                    record[2] = len(line.rstrip(b'\r\n'))
+                    record[3] = len(line)
+                record[0] += len(line.rstrip(b'\r\n'))
+            offset += len(line)
+    with open(f"{fasta_path}.fai", 'w') as index_file:
+        for identifier, (length, sequence_offset, line_bases, line_width) in index.items():
+            index_file.write(f"{identifier}\t{length}\t{sequence_offset}\t{line_bases}\t{line_width}\n")
+    return {identifier: tuple(columns) for identifier, columns in index.items()}
+
+
+def read_fasta_index(fasta_path):
+    '''Read fasta_path.fai, built first if it is missing or older than the fasta file
+    Returns a dict with the identifier as key and the length, offset, residues per line and bytes per line as value
+    '''
+    index_path = f"{fasta_path}.fai"
+    if not os.path.exists(index_path) or os.path.getmtime(index_path) < os.path.getmtime(fasta_path):
+        return build_fasta_index(fasta_path)
+    index = {}
+    with open(index_path, 'r') as index_file:
+        for line in index_file:
+            identifier, *columns = line.rstrip('\n').split('\t')
+            index[identifier] = tuple(int(column) for column in columns[:4])
+    return index
+
+
+class Fasta_library:
+    """Serve the records of a fasta library by identifier, from an indexed single fasta file or from a folder of <identifier>.fasta files
+    """
+    def __init__(self, path):
+        self.path = path
+        self.is_folder = os.path.isdir(path)
+        self.index = None
+        self.fasta_file = None
+        self.fasta_map = None
+        if not self.is_folder:
+            self.index = read_fasta_index(path)
+            self.fasta_file = open(path, 'rb')
+            # an empty file cannot be mapped
+            if os.path.getsize(path) > 0:
+                self.fasta_map = mmap.mmap(self.fasta_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self.fasta_map is not None:
+            self.fasta_map.close()
+        if self.fasta_file is not None:
+            self.fasta_file.close()
+
+    def __contains__(self, identifier):
+        if self.is_folder:
+            return os.path.isfile(os.path.join(self.path, f"{identifier}.fasta"))
+        return identifier in self.index
+
+    def identifiers(self):
+        """Identifiers of the library, sorted for a folder and in file order for a single fasta file
+        """
+        if self.is_folder:
+            return sorted(file_name[:-len('.fasta')] for file_name in os.listdir(self.path) if file_name.lower().endswith('.fasta'))
+        return list(self.index)
+
+    def records(self, identifier):
+        """Header, without the >, and sequence of every record of a protein, a single record in an indexed fasta file
+        Raises a KeyError if the identifier is not in the library
+        """
+        if self.is_folder:
+            fasta_path = os.path.join(self.path, f"{identifier}.fasta")
+            if not os.path.isfile(fasta_path):
+                raise KeyError(identifier)
+            return list(iter_fasta(fasta_path))
+        length, offset, line_bases, line_width = self.index[identifier]
+        # the header is the line just before the sequence
+        header_start = self.fasta_map.rfind(b'\n>', 0, offset - 1) + 1
+        header = self.fasta_map[header_start + 1:offset].decode().strip()
+        if length == 0:
+            return [(header, '')]
+        end = offset + (length // line_bases) * line_width + length % line_bases
+        sequence = self.fasta_map[offset:end].replace(b'\n', b'').replace(b'\r', b'').decode()
+        return [(header, sequence)]
+
+    def sequence(self, identifier):
+        """Sequence of the first record of a protein
+        """
+        return self.records(identifier)[0][1]
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+The purpose of this script is to keep a registry of the predictions of all screens keyed by the content of their chains, so that
+a pair listed twice, as A_B and B_A, or already predicted in an earlier screen is not predicted again.
+
+The key of a prediction is the sha256 of its chain sequences in sorted order, which does not depend on the order of the chains
+or on the fasta headers. combined_fasta_pairs.py checks the registry while combining the fasta files and registers the new
+pairs, and the prediction folders of finished runs are registered with this script so that later screens can link to them.
+
+Usage: python prediction_registry.py <registry.sqlite> <run folder> [--screen name]
+Output: the prediction folders of the run, with their <prediction name>.fasta next to them, recorded in the registry
+'''
+
+import os
+import argparse
+import hashlib
+import sqlite3
+from fasta_library import iter_fasta
+
+def canonical_key(sequences):
+    # sha256 of the sequences sorted and joined, the same for every order of the chains
+    return hashlib.sha256('\n'.join(sorted(sequence.upper() for sequence in sequences)).encode()).hexdigest()
+
+class Prediction_registry:
+    """Class that records the predictions of all screens in a sqlite file, keyed by canonical_key of their chain sequences"""
+    def __init__(self, registry_path):
+        """Initialize an instance of Prediction_registry
+
+        Args:
+            registry_path (str): path to the sqlite file of the registry, created if missing
+        """
+        self.registry_path = registry_path
+        self.connection = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def open(self):
+        """Open the registry, the prediction_folder of a prediction stays empty until the folder of its finished run is registered
+        """
+        self.connection = sqlite3.connect(self.registry_path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS predictions (sequence_key TEXT PRIMARY KEY, prediction_name TEXT NOT NULL, screen TEXT, prediction_folder TEXT)')
+
+    def lookup(self, sequence_key):
+        """Find the prediction of a sequence key
+
+        Args:
+            sequence_key (str): key of the chain sequences, see canonical_key
+
+        Returns:
+            tuple: prediction name, prediction folder, None if not predicted yet, and screen, or None if the key is not in the registry
+        """
+        return self.connection.execute('SELECT prediction_name, prediction_folder, screen FROM predictions WHERE sequence_key = ?', (sequence_key,)).fetchone()
+
+    def register(self, sequence_key, prediction_name, screen=None, prediction_folder=None):
+        """Record a prediction, a key that is already registered keeps its prediction and only gains the prediction folder if it had none
+
+        Args:
+            sequence_key (str): key of the chain sequences, see canonical_key
+            prediction_name (str): name of the prediction, the name of the combined fasta file without extension
+            screen (str): name of the screen the prediction belongs to
+            prediction_folder (str): absolute path to the prediction folder, None while the prediction is pending
+        """
+        self.connection.execute('INSERT OR IGNORE INTO predictions (sequence_key, prediction_name, screen, prediction_folder) VALUES (?, ?, ?, ?)',
+                                (sequence_key, prediction_name, screen, prediction_folder))
+        if prediction_folder is not None:
+            self.connection.execute('UPDATE predictions SET prediction_folder = ? WHERE sequence_key = ? AND prediction_folder IS NULL', (prediction_folder, sequence_key))
+
+    def register_run(self, run_path, screen=None):
+        """Record the prediction folders of a run that finished successfully, identified by the ranking_debug.json AlphaFold writes at the end
+
+        Args:
+            run_path (str): path to the folder containing the prediction folders and their <prediction name>.fasta files
+            screen (str): name of the screen, default the name of the run folder
+
+        Returns:
+            int: number of prediction folders registered
+        """
+        run_path = os.path.abspath(run_path)
+        screen = screen if screen is not None else os.path.basename(run_path)
+        num_registered = 0
+        for prediction_name in sorted(os.listdir(run_path)):
+            prediction_folder = os.path.join(run_path, prediction_name)
+            fasta_path = f'{prediction_folder}.fasta'
+            if not os.path.isdir(prediction_folder) or not os.path.exists(os.path.join(prediction_folder, 'ranking_debug.json')) or not os.path.exists(fasta_path):
+                continue
+            self.register(canonical_key(sequence for header, sequence in iter_fasta(fasta_path)), prediction_name, screen, prediction_folder)
+            num_registered += 1
+        self.connection.commit()
+        return num_registered
+
+    def close(self):
+        """Commit the registered predictions and close the registry
+        """
+        if self.connection is not None:
+            self.connection.commit()
+            self.connection.close()
+            self.connection = None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Register the finished prediction folders of a run in the prediction registry.")
+    parser.add_argument("registry_path", help="Path to the sqlite file of the registry, created if missing.")
+    parser.add_argument("run_path", help="Path to the folder containing the prediction folders and their fasta files.")
+    parser.add_argument("--screen", help="Name of the screen, default the name of the run folder.")
+
+    args = parser.parse_args()
+
+    with Prediction_registry(args.registry_path) as registry:
+        num_registered = registry.register_run(args.run_path, args.screen)
+    print(f"{num_registered} prediction folders registered in '{args.registry_path}'")
@@ -1,34 +1,72 @@
 """
 This script is meant to seperate multiple fastas in a single fasta file to individual fasta files for each protein
+
+The input is read one record at a time, so a whole proteome is never held in memory, and the individual fasta files
+are written by a bounded pool of threads. With --library the records are instead written to a single library fasta
+file with a samtools style .fai index keyed by the identifier of every record.
+
+Usage: python seperate_fasta.py <input_file> <output_dir> [--workers 8] [--library proteome.fasta]
 """
 
+import argparse
 import os
-import sys
+from fasta_library import iter_fasta, header_identifier, build_fasta_index, write_fasta_files
+
+
+def unique_records(input_file):
+    '''Yield the identifier, header and sequence of every record, records without identifier or with the identifier of an earlier record are reported and skipped'''
+    seen = set()
+    for header, sequence in iter_fasta(input_file):
+        identifier = header_identifier(header)
+        if not identifier:
+            print(f"Skipping record without identifier: >{header}")
+            continue
+        if identifier in seen:
+            print(f"Skipping duplicate identifier {identifier}: >{header}")
+            continue
+        seen.add(identifier)
+        yield identifier, header, sequence
 
-def separate_fasta(input_file, output_dir):
+
+def separate_fasta(input_file, output_dir, workers=8):
+    '''Write every record of input_file to <identifier>.fasta in output_dir with a pool of workers threads, see fasta_library.write_fasta_files
+    Returns the number of files written
+    '''
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
-    with open(input_file, 'r') as infile:
-        fasta_content = infile.read()
+    return write_fasta_files(((os.path.join(output_dir, f"{identifier}.fasta"), [(header, sequence)])
+                              for identifier, header, sequence in unique_records(input_file)), workers)
 
-    sequences = fasta_content.split('>')[1:]
 
-    for seq in sequences:
-        header, sequence = seq.split('\n', 1)
-        sequence = sequence.replace('\n', '')
-        identifier = header.split('|')[1]  # Extract the part after the first '|'
-        output_file = os.path.join(output_dir, f"{identifier}.fasta")
-        
-        with open(output_file, 'w') as outfile:
-            outfile.write(f">{header}\n{sequence}\n")
+def write_fasta_library(input_file, library_file):
+    '''Write every record of input_file to the single fasta file library_file, one sequence line per record,
+    and index it into library_file.fai, see fasta_library.build_fasta_index
+    Returns the number of records written
+    '''
+    num_records = 0
+    with open(library_file, 'w') as library:
+        for identifier, header, sequence in unique_records(input_file):
+            library.write(f">{header}\n{sequence}\n")
+            num_records += 1
+    build_fasta_index(library_file)
+    return num_records
 
-if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python separate_fasta.py <input_file> <output_dir>")
-        sys.exit(1)
 
-    input_file = sys.argv[1]
-    output_dir = sys.argv[2]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Separate the records of a multi-fasta file into one fasta file per protein.")
+    parser.add_argument("input_file", help="Path to the multi-fasta file, e.g. a UniProt proteome.")
+    parser.add_argument("output_dir", help="Folder where the individual fasta files are saved.")
+    parser.add_argument("--workers", type=int, default=8, help="Number of threads writing the fasta files, default 8.")
+    parser.add_argument("--library", help="Write a single library fasta file with a .fai index at this path instead of individual files, relative to output_dir.")
+    args = parser.parse_args()
 
-    separate_fasta(input_file, output_dir)
+    if args.library is not None:
+        if not os.path.exists(args.output_dir):
+            os.makedirs(args.output_dir)
+        library_file = os.path.join(args.output_dir, args.library)
+        num_records = write_fasta_library(args.input_file, library_file)
+        print(f"{num_records} sequences written to {library_file} and indexed in {library_file}.fai")
+    else:
+        num_records = separate_fasta(args.input_file, args.output_dir, args.workers)
+        print(f"{num_records} fasta files written to {args.output_dir}")